@@ -3,7 +3,9 @@ import logging
 import datetime
 import importlib
 import asyncio as ai
-import inspect
+import threading
+from functools import partial
+from time import monotonic
 from pathlib import Path
 from importlib import reload
 import aioredis
@@ -11,10 +13,20 @@ from bee.core.utils import URLExpression, ConsoleToURLExpression
 from bee.core.utils import MsgPackExpression
 from bee.core.utils import JSONExpression
 from bee.core.utils import Shortcuts, Action
-from bee.core.utils import ModuleLoader
-from bee.core.utils import BJSON
-from bee.core.utils import Color
+from bee.core.utils import BJSON, BMsgPack
+from bee.core.utils import Color, Table
 from bee.core.user import User
+from bee.core.dispatch import ActionRegistry
+from bee.core.perms import PermissionSet
+from bee.core.scheduler import ActionScheduler
+from bee.core.stats import Stats
+from bee.core.publisher import Publisher
+from bee.core.hook import HookDispatcher
+from bee.core.transport import StreamTransport
+from bee.core.presence import Presence
+from bee.core.offload import Offload
+from bee.core.monitor import LoopMonitor
+from bee.core.bus import bus
 
 logging.basicConfig()
 
@@ -26,55 +38,208 @@ import conf
 try:
     import hooks
 except Exception as e:
-    pass
+    hooks = None
 
 
 class App:
     def __init__(self, app_type, spath=None):
         self.app_type = app_type
+        self.thread = threading.get_ident()
         self.redis = None
+        self.bus = None
+        if getattr(conf, "MESSAGE_BUS", "redis") == "memory":
+            self.bus = bus
         ai.gather(ai.async(self.setup_db()))
-        ai.gather(ai.async(self.setup_redis()))
+        if self.bus is None:
+            ai.gather(ai.async(self.setup_redis()))
         ai.gather(ai.async(self.setup_internal_client()))
         self.conf = conf
         self.shortcuts = None
         self.spath = spath
         self.users = {}
+        self.uids = {}
         self.clients = set()
+        self.binary_clients = set()
+        self.topics = {}
+        self.memberships = {}
+        self.bchunk = getattr(conf, "BROADCAST_CHUNK", 500)
         self.debug = conf.APP_DEBUG
+        self.registry = ActionRegistry(debug=self.debug)
+        self.free_actions = PermissionSet(getattr(conf, "FREE_ACTIONS", []))
         self.uptime = datetime.datetime.now()
         self.tasks = []
-        self.buff = ai.Queue()
+        self.listeners = []
+        self.stats = Stats(enabled=getattr(conf, "STATS", True))
+        self.publisher = Publisher(
+            self,
+            batch=getattr(conf, "PUBLISH_BATCH", 100),
+            max_queue=getattr(conf, "PUBLISH_QUEUE_SIZE", 10000))
+        self.streams = None
+        if getattr(conf, "STREAM_CHANNELS", None) and self.bus is None:
+            self.streams = StreamTransport(self, conf, conf.STREAM_CHANNELS)
+        self.presence = None
+        if getattr(conf, "PRESENCE", False) and self.bus is None \
+                and self.app_type == "ws":
+            self.presence = Presence(self, conf)
+        self.dispatcher = HookDispatcher(
+            self,
+            workers=getattr(conf, "HOOK_WORKERS", 8),
+            queue_size=getattr(conf, "HOOK_QUEUE_SIZE", 1000))
+        self.scheduler = ActionScheduler(
+            self,
+            workers=getattr(conf, "ACTION_WORKERS", 64),
+            per_client=getattr(conf, "ACTION_CLIENT_LIMIT", 16),
+            queue_size=getattr(conf, "ACTION_QUEUE_SIZE", 1024),
+            timeout=getattr(conf, "ACTION_TIMEOUT", None))
+        self.monitor = None
+        self.sync_offload = getattr(conf, "SYNC_OFFLOAD", False)
+        self.offload = Offload(
+            self,
+            threads=getattr(conf, "SYNC_WORKERS", 8),
+            processes=getattr(conf, "PROCESS_WORKERS", None))
         if spath:
             self.shortcuts = Shortcuts(self.spath)
         print(Color.g("- Starting {} application -".format(self.app_type)))
 
+    def off_loop(self, f, *args, **kw):
+        '''
+            Calls made from offload threads are handed over to the loop.
+            Safe off the loop: send, bsend, deliver, join, leave, publish,
+            bind_uid, unbind_uid (so User.login/logout) and run_async.
+            Anything else touching App state, the loop or
+            ai.get_event_loop() must not be used from threaded actions.
+        '''
+        if threading.get_ident() == self.thread:
+            return False
+        self.loop.call_soon_threadsafe(partial(f, *args, **kw))
+        return True
+
+    def run_async(self, coro):
+        # schedules a coroutine on the loop from any thread
+        if threading.get_ident() == self.thread:
+            return self.loop.create_task(coro)
+        return ai.run_coroutine_threadsafe(coro, self.loop)
+
     def send(self, **kw):
+        if self.off_loop(self.send, **kw):
+            return
         if self.app_type == "ws":
             if "_uid" in kw:
                 uid = kw.pop("_uid")
-                for cli, usr in self.users.items():
-                    if usr.uid == uid:
-                        cli.sendMessage(BJSON.encode(kw).encode("utf-8"), False)
-                        break
+                clients = self.uids.get(uid)
+                if clients:
+                    self.deliver(list(clients), kw)
+                if self.presence:
+                    self.loop.create_task(self.presence.send(uid, kw))
+
     def bsend(self, **kw):
+        if self.off_loop(self.bsend, **kw):
+            return
         if self.app_type == "ws":
-            msg = BJSON.encode(kw).encode("utf-8")
-            for cli, _ in self.users.items():
-                cli.sendMessage(msg, False)
+            if "_topic" in kw:
+                clients = self.topics.get(kw.pop("_topic"))
+                if not clients:
+                    return
+            else:
+                clients = self.users
+            clients = list(clients)
+            if len(clients) <= self.bchunk:
+                self.deliver(clients, kw)
+            else:
+                self.loop.create_task(self.fanout(clients, kw))
+
+    def encode(self, kw, binary=False):
+        if binary:
+            return BMsgPack.encode(kw)
+        return BJSON.encode(kw).encode("utf-8")
+
+    def deliver(self, clients, kw, frames=None):
+        # frames: one encoded payload per codec, shared by every receiver
+        if self.off_loop(self.deliver, clients, kw, frames):
+            return
+        if frames is None:
+            frames = {}
+        for cli in clients:
+            if cli not in self.clients:
+                continue
+            binary = cli in self.binary_clients
+            msg = frames.get(binary)
+            if msg is None:
+                msg = frames[binary] = self.encode(kw, binary)
+            cli.sendMessage(msg, binary)
+
+    async def fanout(self, clients, kw):
+        frames = {}
+        for i in range(0, len(clients), self.bchunk):
+            self.deliver(clients[i:i + self.bchunk], kw, frames)
+            await ai.sleep(0)
+
+    def set_codec(self, client, codec):
+        # replies follow the codec of the client's last request, handshake
+        # handlers can also pick it up front.
+        if codec == "msgpack":
+            self.binary_clients.add(client)
+        else:
+            self.binary_clients.discard(client)
+
+    def join(self, client, topic):
+        if self.off_loop(self.join, client, topic):
+            return
+        self.topics.setdefault(topic, set()).add(client)
+        self.memberships.setdefault(client, set()).add(topic)
+
+    def leave(self, client, topic=None):
+        if self.off_loop(self.leave, client, topic):
+            return
+        topics = self.memberships.get(client)
+        if not topics:
+            return
+        for t in ([topic] if topic else list(topics)):
+            topics.discard(t)
+            members = self.topics.get(t)
+            if members is not None:
+                members.discard(client)
+                if not members:
+                    self.topics.pop(t)
+        if not topics:
+            self.memberships.pop(client)
 
     def add_client(self, client):
         if client not in self.clients:
             self.clients.add(client)
-        self.users[client] = User(self)
+        self.users[client] = User(self, client=client)
 
     def remove_client(self, client):
         if client in self.users:
-            user = self.users[client]
+            user = self.users.pop(client)
             if user.is_authenticated:
                 user.logout()
         if client in self.clients:
             self.clients.remove(client)
+        self.leave(client)
+        self.binary_clients.discard(client)
+        self.scheduler.cancel(client)
+
+    def bind_uid(self, client, uid):
+        if self.off_loop(self.bind_uid, client, uid):
+            return
+        if uid not in self.uids and self.presence:
+            self.presence.add(uid)
+        self.uids.setdefault(uid, set()).add(client)
+
+    def unbind_uid(self, client, uid):
+        if self.off_loop(self.unbind_uid, client, uid):
+            return
+        clients = self.uids.get(uid)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                self.uids.pop(uid)
+                if self.presence:
+                    self.presence.remove(uid)
+
+    def get_clients(self, uid):
+        return self.uids.get(uid, set())
 
     def get_current_user(self, client):
         if client in self.users:
@@ -82,14 +247,17 @@ class App:
         return None
 
     def publish(self, channel, **kw):
-        ai.gather(ai.async(self._publish(channel, **kw)))
-
-    async def _publish(self, channel, **kw):
+        if self.off_loop(self.publish, channel, **kw):
+            return
         cname = "{}-{}".format(conf.REDIS_MPATTERN, channel)
-        if "client" in kw and kw['client']:
+        if "client" in kw:
             client = kw.pop("client")
-            kw['_peer'] = client.peer
-        await self.redis.publish(cname, BJSON.encode(kw))
+            if client:
+                kw['_peer'] = client.peer
+        if self.bus is not None:
+            self.bus.publish(cname, kw)
+        else:
+            self.publisher.put(cname, BJSON.encode(kw))
 
     def set_init_params(self, params):
         self.init_params = params
@@ -128,8 +296,24 @@ class App:
             await self.a_exit()
         self.db = db
 
-    def start_services(self):
+    def start_services(self, services=True):
         self.start_listener()
+        if getattr(conf, "LOOP_MONITOR", True):
+            self.monitor = LoopMonitor(
+                self.loop,
+                interval=getattr(conf, "LOOP_MONITOR_INTERVAL", 0.1),
+                threshold=getattr(conf, "LOOP_STALL_THRESHOLD", 0.25),
+                describe=self.describe_task, stats=self.stats)
+            self.tasks.append(self.loop.create_task(self.monitor.sample()))
+        if self.streams:
+            self.tasks.append(self.loop.create_task(self.streams.consume()))
+        if self.presence:
+            self.tasks.append(self.loop.create_task(self.presence.listener()))
+            self.tasks.append(self.loop.create_task(self.presence.heartbeat()))
+        if self.stats.enabled:
+            self.tasks.append(self.loop.create_task(self.publish_stats()))
+        if not services:
+            return
         try:
             import services
         except Exception as e:
@@ -139,10 +323,21 @@ class App:
             for t in [i for i in getmembers(services) if isfunction(i[1])]:
                 self.tasks.append(self.loop.create_task(t[1](self)))
 
+    async def publish_stats(self):
+        interval = getattr(conf, "STATS_INTERVAL", 60)
+        while True:
+            await ai.sleep(interval)
+            if self.stats.metrics:
+                self.publish("stats", app_type=self.app_type,
+                             stats=self.stats.report())
+
     def start_listener(self):
         self.tasks.append(self.loop.create_task(self.listener()))
 
     async def listener(self):
+        if self.bus is not None:
+            await self.bus_listener()
+            return
         if self.redis is None:
             print(Color.y("Waiting for (redis) connection..."))
             await ai.sleep(0.3)
@@ -154,34 +349,110 @@ class App:
             try:
                 craw, params = await ch.get_json()
             except Exception as e:
+                self.dispatcher.decode_errors += 1
                 print(e)
             else:
                 cname = craw.decode("utf-8").replace(
                     "{}-".format(conf.REDIS_MPATTERN), "")
-                f = "{}_message".format(self.app_type)
-                try:
-                    if hasattr(hooks, f):
-                        await getattr(hooks, f)(self, cname, params=params)
-                except Exception as e:
-                    print(e)
+                await self.dispatcher.dispatch(cname, params)
+
+    async def bus_listener(self):
+        q = self.bus.psubscribe("{}-*".format(conf.REDIS_MPATTERN))
+        prefix = len(conf.REDIS_MPATTERN) + 1
+        try:
+            while True:
+                cname, params = await q.get()
+                await self.dispatcher.dispatch(cname[prefix:], params)
+        finally:
+            self.bus.unsubscribe(q)
+
+    def describe_task(self, task):
+        return self.scheduler.names.get(task) or \
+            self.dispatcher.current.get(task)
+
+    def legacy_hook(self):
+        return getattr(hooks, "{}_message".format(self.app_type), None)
 
     def kill_users(self):
-        t = None
-        for u in self.users:
-            if u.ref == self:
-                t = u
-                break
-        if t:
-            t.logout()
-            self.users.pop(t)
-            from time import sleep
-            sleep(4)
+        # logs out every authenticated user, their offline events are
+        # published before the publisher is drained
+        count = 0
+        for client, user in list(self.users.items()):
+            if not user.is_authenticated:
+                continue
+            try:
+                user.logout()
+            except Exception as e:
+                print(Color.r(e))
+            count += 1
+        return count
 
     def is_online(self, uid):
-        return len([u for u in self.users.values() if u.uid == uid])
+        return len(self.uids.get(uid, ()))
+
+    async def is_online_cluster(self, uid):
+        if self.presence:
+            return await self.presence.is_online(uid)
+        return bool(self.is_online(uid))
+
+    async def close_listeners(self):
+        # servers returned by bee_workers' serve() and their sockets
+        for listener in self.listeners:
+            close = getattr(listener, "cleanup", None) or \
+                getattr(listener, "close", None)
+            try:
+                res = close()
+                if ai.iscoroutine(res):
+                    await res
+                if hasattr(listener, "wait_closed"):
+                    await listener.wait_closed()
+            except Exception as e:
+                print(Color.r(e))
+        self.listeners = []
+
+    async def wait_idle(self, parts, timeout):
+        deadline = monotonic() + timeout
+        while any(p.busy() for p in parts):
+            if monotonic() > deadline:
+                return False
+            await ai.sleep(0.05)
+        return True
 
     async def a_exit(self):
+        '''
+            Stops accepting work, waits up to conf.SHUTDOWN_TIMEOUT seconds
+            for running actions and hooks and for the publisher buffer,
+            then cancels whatever is left.
+        '''
+        timeout = getattr(conf, "SHUTDOWN_TIMEOUT", 10)
+        await self.close_listeners()
+        self.scheduler.closing = True
+        if self.streams:
+            self.streams.stop()
+        if not await self.wait_idle([self.scheduler, self.dispatcher],
+                                    timeout):
+            print(Color.r("Shutdown timeout, cancelling running actions"))
+        if self.streams and self.streams.conn is not None:
+            try:
+                await self.streams.flush_acks()
+            except Exception as e:
+                print(Color.r(e))
         self.kill_users()
+        if self.presence:
+            try:
+                await self.presence.clear()
+            except Exception as e:
+                print(Color.r(e))
+        if not await self.wait_idle([self.publisher], timeout):
+            print(Color.r("Shutdown timeout, {} messages not published"
+                          .format(len(self.publisher.buffer))))
+        self.scheduler.stop()
+        self.dispatcher.stop()
+        self.offload.shutdown()
+        if self.monitor:
+            self.monitor.stop()
+        if self.streams:
+            self.streams.close()
         for t in ai.Task.all_tasks():
             t.cancel()
         for t in self.tasks:
@@ -194,20 +465,48 @@ class App:
 
     def set_loop(self, loop):
         self.loop = loop
+        self.thread = threading.get_ident()
 
     def internal_cmd(self, cmd):
         if cmd in ["@reload_shortcuts", "@rl"]:
             self.shortcuts = Shortcuts(self.spath)
             print(Color.g("--ok--"))
+        if cmd in ["@reload_actions", "@ra"]:
+            try:
+                self.registry.reload()
+            except Exception as e:
+                print(Color.r(e))
+            else:
+                print(Color.g("--ok--"))
         if cmd in ["@exit", "@€xit", "@e"]:
             print(Color.r("bye..."))
             ai.gather(ai.async(self.a_exit()))
         if cmd in ["@clear", "@clr", "@c"]:
-            import os
-            os.system('clear')
+            print("\033[2J\033[H", end="", flush=True)
         if cmd == "@cdebug":
             self.debug = not self.debug
+            self.registry.debug = self.debug
             print(Color.g("--debug: {}--".format(self.debug)))
+        if cmd.startswith("@stats"):
+            if cmd.split("@stats")[1].strip() == "reset":
+                self.stats.reset()
+                print(Color.g("--ok--"))
+            else:
+                print(Table(self.stats.rows()))
+        if cmd == "@jobs":
+            print(Color.g(self.scheduler.stats()))
+            if self.bus is not None:
+                print(Color.g(self.bus.stats()))
+            else:
+                print(Color.g(self.publisher.stats()))
+            print(Color.g(self.dispatcher.stats()))
+            print(Color.g(self.offload.stats()))
+            if self.monitor:
+                print(Color.g(self.monitor.stats()))
+            if self.streams:
+                print(Color.g(self.streams.stats()))
+            if self.presence:
+                print(Color.g(self.presence.stats()))
         if cmd in ["@date", "@dt"]:
             print(Color.g(datetime.datetime.now()))
         if cmd in ["@uptime", "@up"]:
@@ -220,6 +519,10 @@ class App:
                 print(Color.r(e))
             else:
                 self.conf = conf
+                self.free_actions = PermissionSet(
+                    getattr(conf, "FREE_ACTIONS", []))
+                for user in self.users.values():
+                    user.reset_permissions()
                 print(Color.g("--ok--"))
 
         if cmd.startswith("@cmdtocsv"):
@@ -280,9 +583,12 @@ class App:
 
         if cmd in ["@?"]:
             print(Color.g("@reload_shortcuts (@rl) : Reload shortcuts yaml"))
+            print(Color.g("@reload_actions (@ra) : Reload cached action modules"))
             print(Color.g("@exit (@e) : Exit"))
             print(Color.g("@clear (@c) : Clear screen"))
             print(Color.g("@cdebug : Switch debug"))
+            print(Color.g("@jobs : Print action scheduler, publish and hook stats"))
+            print(Color.g("@stats [reset] : Print (or reset) action latencies (us)"))
             print(Color.g("@date (@dt) : Print datetime"))
             print(Color.g("@uptime (@up) : Print app up and running time"))
             print(Color.g("@reload_conf (@rc) : Reload app config from conf.py"))
@@ -332,20 +638,19 @@ class App:
             url = url.replace("/", ".")
             if url.count(".") != 2:
                 return web.json_response({'error': 'invalid-request'})
+            t0 = self.stats.now()
             ue = URLExpression(url)
+            t1 = self.stats.now()
             action = self._action(ue)
+            timings = {'parse': t1 - t0, 'shortcut': self.stats.now() - t1}
         except Exception as e:
             print(Color.r(e, b=True))
             return web.json_response({'error 2': str(e)})
         else:
             if action:
                 try:
-                    ml = ModuleLoader("apps.web.actions", debug=self.debug)
-                    mod = ml.load(action.m)
-                    if mod is None:
-                        return web.json_response({'error': 'unknown-mod'})
-                    else:
-                        return await self.web_execute(mod, action, request, web)
+                    return await self.web_execute(
+                        action, request, web, timings=timings)
                 except Exception as e:
                     return web.json_response({'error 3': str(e)})
             else:
@@ -356,76 +661,58 @@ class App:
             self.internal_cmd(cmd.strip())
             return
         try:
+            t0 = self.stats.now()
             ue = URLExpression(ConsoleToURLExpression(cmd).url)
+            t1 = self.stats.now()
             action = self._action(ue)
+            timings = {'parse': t1 - t0, 'shortcut': self.stats.now() - t1}
         except Exception as e:
             print(Color.r(e, b=True))
         else:
             if action:
-                ml = ModuleLoader("apps.console.actions", debug=self.debug)
-                mod = ml.load(action.m)
-                self.execute(mod, action)
+                self.execute("console", action, timings=timings)
             else:
-                self.publish("error", "Unknown action")
+                self.publish("error", desc="Unknown action")
 
     def b_ws_action(self, client, cmd):
         try:
+            t0 = self.stats.now()
             rcmd = MsgPackExpression(cmd)
         except Exception as e:
             print(Color.r(e, b=True))
         else:
-            tcmds = []
-            if type(rcmd.data) is not dict:
-                for t in rcmd.data:
-                    tcmds.append({data: t})
-            else:
-                tcmds = [rcmd]
-
-            for cmd in tcmds:
-                try:
-                    action = self._action(cmd)
-                    if action:
-                        ml = ModuleLoader("apps.ws.actions", debug=self.debug)
-                        mod = ml.load(action.m)
-                        self.execute(mod, action, client=client)
-                    else:
-                        self.publish("error", "Unknown action", client=client)
-                except Exception as e:
-                    print(cmd, Color.r(e, b=True))
+            self.set_codec(client, "msgpack")
+            self.ws_execute(client, rcmd, self.stats.now() - t0)
 
     def ws_action(self, client, cmd):
         try:
+            t0 = self.stats.now()
             rcmd = JSONExpression(cmd)
         except Exception as e:
             print(Color.r(e, b=True))
         else:
-            tcmds = []
-            if type(rcmd.data) is not dict:
-                for t in rcmd.data:
-                    temp = JSONExpression("{}")
-                    temp.data = t
-                    tcmds.append(temp)
-            else:
-                tcmds = [rcmd]
-
-            for cmd in tcmds:
-                try:
-                    action = self._action(cmd)
-                    if action:
-                        ml = ModuleLoader("apps.ws.actions", debug=self.debug)
-                        mod = ml.load(action.m)
-                        self.execute(mod, action, client=client)
-                    else:
-                        self.publish("error", "Unknown action", client=client)
-                except Exception as e:
-                    print(cmd, Color.r(e, b=True))
-
+            self.set_codec(client, "json")
+            self.ws_execute(client, rcmd, self.stats.now() - t0)
+
+    def ws_execute(self, client, rcmd, parse=0):
+        cmds = rcmd.split()
+        # a batch frame is decoded once, its cost is shared by its actions
+        parse = parse / len(cmds) if cmds else 0
+        for cmd in cmds:
+            try:
+                t0 = self.stats.now()
+                # scalar frames (5, "x", null) are not actions
+                action = self._action(cmd) \
+                    if isinstance(cmd.data, dict) else None
+                timings = {'parse': parse, 'shortcut': self.stats.now() - t0}
+                if action:
+                    self.execute("ws", action, client=client, timings=timings)
+                else:
+                    self.publish("error", desc="Unknown action", client=client)
+            except Exception as e:
+                print(cmd, Color.r(e, b=True))
 
-    async def web_execute(self, mod, action, request, web):
-        if mod is None:
-            return web.json_response({
-                'status': 500,
-                'desc': "Module not found, action-> {}".format(action)})
+    async def web_execute(self, action, request, web, timings=None):
         if action.ready is False:
             return web.json_response({
                 'status': 500,
@@ -439,37 +726,35 @@ class App:
                          detail="{}.{}.{}".format(action.m, action.c, action.f), client=client)
         """
         if action.ready:
-            if action.reload_module:
-                mod = reload(mod)
+            timings = timings if timings is not None else {}
+            t0 = self.stats.now()
             try:
-                klass = getattr(mod, action.c)
+                mod, desc = self.registry.resolve("web", action)
             except Exception as e:
                 return web.json_response({'status': 500, 'desc': str(e)})
+            if mod is None:
+                return web.json_response({'error': 'unknown-mod'})
+            timings['load'] = self.stats.now() - t0
+            name = "{}.{}.{}".format(action.m, action.c, action.f)
 
             if "_help" in action.data or "_h" in action.data:
-                try:
-                    ht = inspect.getdoc(getattr(klass, action.f))
-                    if ht:
-                        return web.json_response({'help': ht})
-                    else:
-                        return web.json_response({'help': 'Missing doc.'})
-                    return
-                except:
-                    pass
-            inst = klass(self)
+                if desc.doc:
+                    return web.json_response({'help': desc.doc})
+                return web.json_response({'help': 'Missing doc.'})
+            inst = desc.klass(self)
+            if desc.exists:
+                self.stats.record_all(name, timings)
+            t0 = self.stats.now()
             try:
                 return await getattr(inst, action.f)(request, web, **action.data)
             except Exception as e:
                 raise e
                 return web.json_response({'status': 500, 'desc': str(e)})
+            finally:
+                if desc.exists:
+                    self.stats.record(name, "action", self.stats.now() - t0)
 
-    def execute(self, mod, action, client=None):
-        if mod is None:
-            self.publish(
-                "error",
-                desc="Module not found, action-> {}".format(action),
-                client=client)
-            return
+    def execute(self, app_type, action, client=None, timings=None):
         if action.ready is False:
             self.publish("error", desc="Action isn't ready!", client=client)
 
@@ -478,7 +763,10 @@ class App:
         else:
             user = User(self)
 
+        timings = timings if timings is not None else {}
+        t0 = self.stats.now()
         perm = user.check_permission(action) or self.app_type == "console"
+        timings['permission'] = self.stats.now() - t0
         if perm is False:
             self.publish(
                 "error",
@@ -486,48 +774,86 @@ class App:
                 detail="{}.{}.{}".format(action.m, action.c, action.f),
                 client=client)
         if action.ready and perm:
+            t0 = self.stats.now()
+            try:
+                mod, desc = self.registry.resolve(app_type, action)
+            except Exception as e:
+                self.publish("exp", desc=str(e), client=client)
+                return
+            if mod is None:
+                self.publish(
+                    "error",
+                    desc="Module not found, action-> {}".format(action),
+                    client=client)
+                return
+            timings['load'] = self.stats.now() - t0
+            name = "{}.{}.{}".format(action.m, action.c, action.f)
+            # only existing actions are recorded, names come from clients
+            if desc.exists:
+                self.stats.record_all(name, timings)
             if action.reload_module:
                 self.publish(
                     "info",
                     desc="Reloading {}".format(mod),
                     client=client)
-                mod = reload(mod)
-            try:
-                klass = getattr(mod, action.c)
-            except Exception as e:
-                self.publish("exp", desc=str(e), client=client)
-                return
+            klass = desc.klass
             if "_help" in action.data or "_h" in action.data:
-                try:
-                    ht = inspect.getdoc(getattr(klass, action.f))
-                    if ht:
-                        print(Color.g(ht))
+                if desc.exists:
+                    if desc.doc:
+                        print(Color.g(desc.doc))
                     else:
                         print(Color.y("Missing doc."))
                     return
-                except:
-                    pass
             if action.static:
-                if hasattr(klass, action.f):
-                    try:
-                        getattr(klass, action.f)(self, **action.data)
-                    except Exception as e:
-                        self.publish("exp", desc=str(e), client=client)
-            else:
-                if action.sync:
-                    try:
-                        inst = klass(self, client=client)
-                        if hasattr(inst, action.f):
-                            getattr(inst, action.f)(**action.data)
-                    except Exception as e:
-                        self.publish("exp", desc=str(e), client=client)
+                if not desc.exists:
+                    return
+                if self.threaded(desc):
+                    self.schedule(name, lambda: self.offload.thread(
+                        desc.func, self, **action.data),
+                        client, app_type, desc)
                 else:
+                    self.run_inline(name, desc.func, client, self,
+                                    **action.data)
+            else:
+                try:
                     inst = klass(self, client=client)
-                    try:
-                        ai.gather(ai.async(
-                            getattr(inst, action.f)(**action.data)))
-                    except Exception as e:
-                        self.publish("exp", desc=str(e), client=client)
+                except Exception as e:
+                    self.publish("exp", desc=str(e), client=client)
+                    return
+                if not action.sync:
+                    self.schedule(
+                        name, lambda: getattr(inst, action.f)(**action.data),
+                        client, app_type, desc)
+                elif desc.exists:
+                    if getattr(desc.func, "cpu", False):
+                        self.schedule(name, lambda: self.offload.cpu(
+                            inst, action.f, action.data),
+                            client, app_type, desc)
+                    elif self.threaded(desc):
+                        self.schedule(name, lambda: self.offload.thread(
+                            getattr(inst, action.f), **action.data),
+                            client, app_type, desc)
+                    else:
+                        self.run_inline(name, getattr(inst, action.f),
+                                        client, **action.data)
+
+    def threaded(self, desc):
+        return self.sync_offload or getattr(desc.func, "threaded", False)
+
+    def run_inline(self, name, f, client, *args, **kw):
+        t0 = self.stats.now()
+        try:
+            f(*args, **kw)
+        except Exception as e:
+            self.publish("exp", desc=str(e), client=client)
+        self.stats.record(name, "action", self.stats.now() - t0)
+
+    def schedule(self, name, factory, client, app_type, desc):
+        if not self.scheduler.submit(
+                name, factory, client=client, priority=app_type,
+                timeout=desc.timeout, stats=desc.exists):
+            self.publish("error", desc="Server busy!",
+                         detail=name, client=client)
 
     def url_action(self, url):
         ue = URLExpression(url)
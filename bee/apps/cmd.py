@@ -1,5 +1,42 @@
 import inspect
-from bee.core.utils import BJSON
+
+
+def timeout(seconds):
+    '''
+        Overrides conf.ACTION_TIMEOUT (no limit by default) for an action,
+        0 disables it:
+            @timeout(5)
+            async def report(self, **kw): ...
+    '''
+    def deco(f):
+        f.timeout = seconds
+        return f
+    return deco
+
+
+def threaded(f):
+    '''
+        Runs a sync (_sc) or static (_st) action in the thread pool
+        (conf.SYNC_WORKERS) instead of on the loop, for blocking work:
+            @threaded
+            def export(self, **kw): ...
+        Only the helpers listed in App.off_loop may be used from it.
+    '''
+    f.threaded = True
+    return f
+
+
+def cpu(f):
+    '''
+        Runs a sync (_sc) action in the process pool (conf.PROCESS_WORKERS)
+        instead of a thread. The method only gets its params, self is None,
+        a returned dict is sent to the client:
+            @cpu
+            def digest(self, **kw):
+                return {'digest': sha256(kw['data'].encode()).hexdigest()}
+    '''
+    f.cpu = True
+    return f
 
 
 class Cmd:
@@ -11,13 +48,20 @@ class Cmd:
     def send(self, **kw):
         if self.app.app_type == "ws":
             if "_uid" in kw:
-                uid = kw.pop("_uid")
-                for cli, usr in self.app.users.items():
-                    if usr.uid == uid:
-                        cli.sendMessage(BJSON.encode(kw).encode("utf-8"), False)
-                        break
+                self.app.send(**kw)
             elif self.client:
-                self.client.sendMessage(BJSON.encode(kw).encode("utf-8"), False)
+                self.app.deliver([self.client], kw)
+
+    def bsend(self, **kw):
+        self.app.bsend(**kw)
+
+    def join(self, topic):
+        if self.client:
+            self.app.join(self.client, topic)
+
+    def leave(self, topic=None):
+        if self.client:
+            self.app.leave(self.client, topic)
 
     @staticmethod
     def get_param_or_none(items, item):
@@ -24,7 +24,9 @@ def main():
         loop.run_until_complete(stdin_pipe_reader)
         loop.run_forever()
     except KeyboardInterrupt:
-        app.kill_users()
+        if app.kill_users():
+            from time import sleep
+            sleep(4)
     finally:
         loop.close()
 
@@ -0,0 +1,49 @@
+import asyncio as ai
+from fnmatch import fnmatchcase
+
+
+class MemoryBus:
+    '''
+        In-process replacement for redis pub/sub (conf.MESSAGE_BUS =
+        "memory"). Subscribers get (channel, params) tuples on their own
+        queue, params are passed as is, without serialization.
+    '''
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.subscribers = []
+        self.cache = {}
+        self.published = 0
+        self.dropped = 0
+
+    def psubscribe(self, pattern):
+        q = ai.Queue(maxsize=self.maxsize)
+        self.subscribers.append((pattern, q))
+        self.cache = {}
+        return q
+
+    def unsubscribe(self, q):
+        self.subscribers = [s for s in self.subscribers if s[1] is not q]
+        self.cache = {}
+
+    def publish(self, cname, params):
+        queues = self.cache.get(cname)
+        if queues is None:
+            queues = self.cache[cname] = [
+                q for pattern, q in self.subscribers
+                if fnmatchcase(cname, pattern)]
+        self.published += 1
+        for q in queues:
+            try:
+                q.put_nowait((cname, params))
+            except ai.QueueFull:
+                self.dropped += 1
+        return len(queues)
+
+    def stats(self):
+        return {'subscribers': len(self.subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'queued': sum(q.qsize() for _, q in self.subscribers)}
+
+
+bus = MemoryBus()
@@ -0,0 +1,195 @@
+import asyncio as ai
+import json
+from time import monotonic, time
+import aioredis
+import conf
+from bee.core.mikro import Mikro
+from bee.core.jobs import every
+from bee.core.stats import Histogram
+from bee.core.transport import StreamReader, consumer_name
+
+
+class Consumer(Mikro):
+    '''
+        Base class for workers fed by a redis list (source = "list", BLPOP
+        then LRANGE/LTRIM in one transaction) or a stream consumer group
+        (source = "stream", XREADGROUP):
+            class Mailer(Consumer):
+                queue = "mails"
+                async def handle(self, item): ...
+            Mailer().start()
+        Up to `batch` items are read per round trip with `prefetch` batches
+        read ahead, a batch is handled `concurrency` items at a time and
+        stream entries are acked with one XACK per batch. Reads block on
+        their own connection, acks and reports go through the pool. Failed
+        stream entries stay pending and are claimed again after
+        `claim_idle` ms, up to `max_deliveries` times, then moved to the
+        `dead` stream (if set). Failed list items are pushed to the `dead`
+        list if set.
+    '''
+    redis_on = True
+    queue = None
+    source = "list"
+    group = None
+    dead = None
+    batch = 100
+    prefetch = 2
+    concurrency = 10
+    block = 1
+    claim_idle = 60000
+    claim_interval = 30
+    max_deliveries = 10
+
+    def __init__(self):
+        super().__init__()
+        self.consumer = consumer_name(conf)
+        self.group = self.group or "{}-{}".format(
+            conf.REDIS_MPATTERN, type(self).__name__)
+        self.reader = None
+        self.conn = None
+        self.batches = ai.Queue(maxsize=self.prefetch)
+        self.slots = ai.Semaphore(self.concurrency)
+        self.batch_time = Histogram()
+        self.lag = Histogram()
+        self.received = 0
+        self.handled = 0
+        self.failed = 0
+        self.acked = 0
+        self.reads = 0
+        self.backlog = 0
+        self.mark = (monotonic(), 0)
+        self.rate = 0
+
+    async def handle(self, item):
+        pass
+
+    def decode(self, raw):
+        if isinstance(raw, dict):
+            raw = raw.get('data', raw)
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError):
+            return raw
+
+    async def process(self):
+        self.spawn("read", self.read)
+        self.spawn("work", self.work)
+        await super().process()
+
+    async def read(self):
+        while self.redis is None:
+            await ai.sleep(0.3)
+        # blocking reads would hold up every pool command behind them
+        self.conn = await aioredis.create_redis(
+            (conf.REDIS_HOST, conf.REDIS_PORT), encoding="utf-8")
+        try:
+            if self.source == "stream":
+                await self.read_stream()
+            while True:
+                items = await self.read_list()
+                if items:
+                    await self.batches.put(items)
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    async def read_stream(self):
+        self.reader = StreamReader(
+            self.conn, [self.queue], self.group, self.consumer,
+            batch=self.batch, block=int(self.block * 1000),
+            claim_idle=self.claim_idle, max_deliveries=self.max_deliveries,
+            dead={self.queue: self.dead} if self.dead else None)
+        await self.reader.setup()
+        await self.put_entries(await self.reader.replay())
+        next_claim = 0
+        while True:
+            if monotonic() >= next_claim:
+                await self.put_entries(await self.reader.claim())
+                next_claim = monotonic() + self.claim_interval
+            await self.put_entries(await self.reader.read())
+
+    async def put_entries(self, entries):
+        self.reads += 1
+        for i in range(0, len(entries), self.batch):
+            await self.batches.put([(mid, fields) for _, mid, fields
+                                    in entries[i:i + self.batch]])
+
+    async def read_list(self):
+        first = await self.conn.blpop(self.queue, timeout=self.block)
+        self.reads += 1
+        if first is None:
+            return []
+        items = [(None, first[1])]
+        if self.batch > 1:
+            tr = self.conn.multi_exec()
+            rest = tr.lrange(self.queue, 0, self.batch - 2)
+            tr.ltrim(self.queue, self.batch - 1, -1)
+            await tr.execute()
+            items.extend((None, raw) for raw in await rest)
+            self.reads += 1
+        return items
+
+    async def work(self):
+        while True:
+            items = await self.batches.get()
+            start = monotonic()
+            self.received += len(items)
+            if self.source == "stream":
+                now = time() * 1000
+                for mid, _ in items:
+                    self.lag.record(max(now - int(mid.split("-")[0]), 0)
+                                    / 1000.0)
+            results = await ai.gather(*[self.run(raw) for _, raw in items])
+            await self.ack([item for item, ok in zip(items, results) if ok],
+                           [item for item, ok in zip(items, results)
+                            if not ok])
+            self.batch_time.record(monotonic() - start)
+
+    async def run(self, raw):
+        async with self.slots:
+            try:
+                await self.handle(self.decode(raw))
+            except Exception as e:
+                self.failed += 1
+                print("{}: {!r}".format(type(self).__name__, e))
+                return False
+            self.handled += 1
+            return True
+
+    async def ack(self, done, failed):
+        if self.source == "stream":
+            if done:
+                await self.redis.xack(self.queue, self.group,
+                                      *[mid for mid, _ in done])
+            self.acked += len(done)
+        elif failed and self.dead:
+            await self.redis.rpush(self.dead, *[raw for _, raw in failed])
+
+    @every(getattr(conf, "CONSUMER_REPORT_INTERVAL", 60))
+    async def report(self):
+        if self.redis is None:
+            return
+        if self.source == "stream":
+            self.backlog = await self.redis.xlen(self.queue)
+        else:
+            self.backlog = await self.redis.llen(self.queue)
+        now = monotonic()
+        then, handled = self.mark
+        self.rate = round((self.handled - handled) / (now - then), 1)
+        self.mark = (now, self.handled)
+        print(self.stats())
+
+    def stats(self):
+        return {'queue': self.queue,
+                'received': self.received,
+                'handled': self.handled,
+                'failed': self.failed,
+                'acked': self.acked,
+                'reads': self.reads,
+                'backlog': self.backlog,
+                'per_second': self.rate,
+                'prefetched': self.batches.qsize(),
+                'claimed': self.reader.claimed if self.reader else 0,
+                'dead': self.reader.dropped if self.reader else 0,
+                'batch': self.batch_time.summary(),
+                'lag': self.lag.summary()}
@@ -0,0 +1,84 @@
+import inspect
+from importlib import reload
+from bee.core.utils import ModuleLoader
+
+
+class ActionDescriptor:
+    def __init__(self, mod, klass, name):
+        self.mod = mod
+        self.klass = klass
+        self.name = name
+        self.func = getattr(klass, name, None)
+        self.exists = self.func is not None
+        self.is_coroutine = inspect.iscoroutinefunction(self.func)
+        self.doc = inspect.getdoc(self.func) if self.exists else None
+        self.timeout = getattr(self.func, "timeout", None)
+
+    def __repr__(self):
+        return "<ActionDescriptor: {}.{}.{}, coroutine: {}>".format(
+            self.mod.__name__, self.klass.__name__, self.name,
+            self.is_coroutine)
+
+
+class ActionRegistry:
+    '''
+        Resolves (app_type, m, c, f) to an ActionDescriptor once and keeps
+        it (missing functions are not cached) until the module is reloaded (_reload=1) or the registry is
+        reloaded (@reload_actions).
+    '''
+    def __init__(self, debug=False):
+        self.debug = debug
+        self.modules = {}
+        self.actions = {}
+
+    @classmethod
+    def moddir(cls, app_type):
+        return "apps.{}.actions".format(app_type)
+
+    def module(self, app_type, m, reload_module=False):
+        key = (app_type, m)
+        mod = self.modules.get(key)
+        if mod is None:
+            mod = ModuleLoader(self.moddir(app_type), debug=self.debug).load(m)
+            if mod is None:
+                return None
+            self.modules[key] = mod
+        elif reload_module:
+            mod = reload(mod)
+            self.modules[key] = mod
+            self.invalidate(app_type, m)
+        return mod
+
+    def resolve(self, app_type, action):
+        '''
+            Returns (module, descriptor). Raises AttributeError when the
+            class is missing, module is None when it can't be loaded.
+        '''
+        key = (app_type, action.m, action.c, action.f)
+        if not action.reload_module:
+            desc = self.actions.get(key)
+            if desc is not None:
+                return desc.mod, desc
+        mod = self.module(app_type, action.m,
+                          reload_module=action.reload_module)
+        if mod is None:
+            return None, None
+        desc = ActionDescriptor(mod, getattr(mod, action.c), action.f)
+        # names come from clients, only existing actions are kept
+        if desc.exists:
+            self.actions[key] = desc
+        return mod, desc
+
+    def reload(self):
+        self.actions.clear()
+        for key, mod in list(self.modules.items()):
+            try:
+                self.modules[key] = reload(mod)
+            except Exception:
+                self.modules.pop(key)
+                raise
+
+    def invalidate(self, app_type, m=None):
+        for key in [k for k in self.actions
+                    if k[0] == app_type and (m is None or k[1] == m)]:
+            self.actions.pop(key)
@@ -0,0 +1,133 @@
+"""
+    Command / url expression parsing and command line options. Kept free of
+    third party imports so that bee_msg starts fast, bee.core.utils
+    re-exports everything.
+"""
+import re
+import sys
+import shlex
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+class CustomCast:
+    '''
+        Usage: CustomCast.cast(str)
+        b+ bool
+        d+ Decimal
+        f+ float
+        dt+ datetime (d/m/Y H:M:S)
+        date+ date(d/m/Y)
+        i+ int
+    '''
+    aliases = {'b+': ['bool+'],
+               'd+': ['decimal+', 'dec+'],
+               'f+': ['float+'],
+               'dt+': ['datetime+'],
+               'date+': [],
+               'i+': ['int+'],
+               's+': ['str+']}
+    cmap = {'d+': Decimal, 'f+': float,
+            'dt+': lambda n: datetime.strptime(n, "%d/%m/%Y %H:%M:%S"),
+            'date+': lambda n: datetime.strptime(n, "%d/%m/%Y").date(),
+            'i+': int, 's+': str}
+    # "<prefix>+" (aliases included) -> converter, looked up once per value
+    prefixes = dict(cmap)
+    for k, v in cmap.items():
+        prefixes.update(dict.fromkeys(aliases[k], v))
+    del k, v
+    booleans = {"True": True, "true": True, "False": False, "false": False}
+    for k in ['b+'] + aliases['b+']:
+        for v in ("true", "True", "false", "False"):
+            booleans["{} {}".format(k, v)] = booleans[v]
+    del k, v
+    listexp = re.compile(
+        r"\[(\||,)(b\+|d\+|f\+|dt\+|date\+|i\+|s\+)\](.*)",
+        re.MULTILINE | re.VERBOSE)
+
+    @classmethod
+    def clear(cls, value):
+        for k in cls.aliases.keys():
+            if value.startswith(k):
+                return value.split(k)[1].strip()
+        return value
+    @classmethod
+    def do(cls, value):
+        idx = value.find("+ ")
+        if idx > 0:
+            conv = cls.prefixes.get(value[:idx + 1])
+            if conv is not None:
+                return conv(value[idx + 2:])
+        return cls.booleans.get(value, value)
+
+    @classmethod
+    def cast(cls, value):
+        if "[" not in value:
+            return cls.do(value)
+        match = cls.listexp.search(value)
+        if match:
+            try:
+                sep = match.group(1)
+                itype = match.group(2)
+                val = match.group(3)
+                return [cls.do("{} {}".format(
+                    itype.strip(), t.strip())) for t in val.split(sep)]
+            except Exception as e:
+                from bee.core.utils import Color
+                print(Color.r(e))
+                return value
+        else:
+            return cls.do(value)
+
+@lru_cache(maxsize=4096)
+def parse_url(exp):
+    # cached per raw url, URLExpression copies the result before use
+    path, _, query = exp.partition("#")[0].partition("?")
+    params = {}
+    for i in query.split("&"):
+        if "=" in i:
+            k, v = i.split("=")
+            params[k] = CustomCast.cast(v)
+    return path.split("."), params
+
+@lru_cache(maxsize=4096)
+def console_to_url(exp):
+    params = shlex.split(exp)
+    cmd = params.pop(0).replace("/", ".")
+    return "{}?{}".format(cmd, str.join("&", params))
+
+class URLExpression:
+    def __init__(self, exp):
+        self.parse(exp)
+    def parse(self, exp):
+        path, params = parse_url(exp)
+        path = list(path)
+        self.data = {'data': {k: list(v) if type(v) is list else v
+                              for k, v in params.items()}}
+        if path:
+            _f = path.pop(-1)
+            self.data.update({'_f': _f})
+        if path:
+            _c = path.pop(-1)
+            self.data.update({'_c': _c})
+        if path:
+            _m = str.join(".", path)
+            self.data.update({'_m': _m})
+    def __str__(self):
+        return str.join(", ", ["{}={}".format(k, v) for k, v in self.data.items()])
+
+class ConsoleToURLExpression:
+    def __init__(self, exp):
+        self.url = None
+        self.parse(exp)
+
+    def parse(self, exp):
+        self.url = console_to_url(exp)
+
+def get_option(name, default):
+    # "--name=value" from sys.argv, cast to the type of the default
+    prefix = "--{}=".format(name)
+    for a in sys.argv:
+        if a.startswith(prefix):
+            return type(default)(a[len(prefix):])
+    return default
@@ -1,3 +1,10 @@
+import asyncio as ai
+from fnmatch import fnmatchcase
+from itertools import cycle
+from time import perf_counter
+from bee.core.monitor import current_task
+
+
 class Hook:
     def __init__(self, app, cname, params):
         self.app = app
@@ -6,3 +13,146 @@ class Hook:
 
     async def process(self):
         pass
+
+
+class HookRegistry:
+    '''
+        Channel pattern (fnmatch, like redis psubscribe) -> Hook subclasses.
+        Usage, in the application's hooks module:
+            @hook("orm", ordered=True)
+            class OrmHook(Hook):
+                async def process(self): ...
+        ordered hooks of a channel run one message at a time, in order.
+    '''
+    def __init__(self):
+        self.handlers = []
+        self.cache = {}
+
+    def register(self, pattern, ordered=False):
+        def deco(klass):
+            self.handlers.append((pattern, klass, ordered))
+            self.cache = {}
+            return klass
+        return deco
+
+    def match(self, cname):
+        items = self.cache.get(cname)
+        if items is None:
+            items = self.cache[cname] = [
+                (klass, ordered) for pattern, klass, ordered in self.handlers
+                if fnmatchcase(cname, pattern)]
+        return items
+
+
+registry = HookRegistry()
+hook = registry.register
+
+
+class Pending:
+    # calls done() once every handler of a message has finished, unless one
+    # of them failed (the stream entry then stays pending for a retry)
+    def __init__(self, count, done):
+        self.count = count
+        self.callback = done
+        self.failed = False
+
+    def done(self, ok=True):
+        self.count -= 1
+        if not ok:
+            self.failed = True
+        if self.count == 0 and not self.failed:
+            self.callback()
+
+
+class HookDispatcher:
+    '''
+        Runs channel handlers on `workers` tasks with bounded queues.
+        Ordered handlers always land on the same worker for a channel,
+        others are spread round robin.
+    '''
+    def __init__(self, app, registry=registry, workers=8, queue_size=1000):
+        self.app = app
+        self.registry = registry
+        self.size = workers
+        self.queue_size = queue_size
+        self.queues = []
+        self.workers = []
+        self.robin = None
+        self.current = {}
+        self.active = 0
+        self.received = 0
+        self.decode_errors = 0
+        self.errors = 0
+
+    def start(self):
+        self.queues = [ai.Queue(maxsize=self.queue_size)
+                       for _ in range(self.size)]
+        self.workers = [self.app.loop.create_task(self.worker(q))
+                        for q in self.queues]
+        self.robin = cycle(self.queues)
+
+    def stop(self):
+        for w in self.workers:
+            w.cancel()
+        self.workers = []
+
+    def handlers(self, cname):
+        items = list(self.registry.match(cname))
+        legacy = self.app.legacy_hook()
+        if legacy is not None:
+            items.append((legacy, True))
+        return items
+
+    async def dispatch(self, cname, params, ack=None):
+        if not self.workers:
+            self.start()
+        self.received += 1
+        handlers = self.handlers(cname)
+        pending = None
+        if ack is not None:
+            if not handlers:
+                ack()
+                return
+            pending = Pending(len(handlers), ack)
+        for handler, ordered in handlers:
+            if ordered:
+                q = self.queues[hash(cname) % self.size]
+            else:
+                q = next(self.robin)
+            await q.put((handler, cname, params, pending))
+
+    async def worker(self, q):
+        task = current_task()
+        while True:
+            handler, cname, params, pending = await q.get()
+            # stats are kept per handler, channel names are unbounded
+            name = getattr(handler, "__name__", "-")
+            self.current[task] = "{}:{}".format(cname, name)
+            self.active += 1
+            start = perf_counter()
+            ok = False
+            try:
+                if isinstance(handler, type):
+                    await handler(self.app, cname, {'params': params}).process()
+                else:
+                    await handler(self.app, cname, params=params)
+                ok = True
+            except Exception as e:
+                self.errors += 1
+                print(e)
+            finally:
+                self.active -= 1
+                self.current.pop(task, None)
+                self.app.stats.record(name, "hook", perf_counter() - start)
+                if pending is not None:
+                    pending.done(ok)
+                q.task_done()
+
+    def busy(self):
+        return bool(self.active or any(q.qsize() for q in self.queues))
+
+    def stats(self):
+        return {'received': self.received,
+                'decode_errors': self.decode_errors,
+                'errors': self.errors,
+                'queued': sum(q.qsize() for q in self.queues)}
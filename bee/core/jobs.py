@@ -0,0 +1,184 @@
+import asyncio as ai
+import inspect
+from random import uniform
+
+
+def every(interval, jitter=0, concurrency=1, delay=0):
+    '''
+        Declares a periodic Mikro job:
+            @every(5, jitter=0.5)
+            async def refresh(self): ...
+        Runs are due at start + delay + n * interval (+ up to `jitter`
+        seconds) on the loop's monotonic clock, so slow runs don't push the
+        next ones back; missed slots are skipped, not replayed. A run is
+        skipped when `concurrency` runs are still going.
+    '''
+    def deco(f):
+        f.job = {'kind': "every", 'interval': interval, 'jitter': jitter,
+                 'concurrency': concurrency, 'delay': delay}
+        return f
+    return deco
+
+
+def on(channel, concurrency=1):
+    '''
+        Declares a Mikro job woken by messages published (App.publish /
+        bee_msg) on `channel`, a psubscribe pattern without the
+        REDIS_MPATTERN prefix. Needs redis_on:
+            @on("orders")
+            async def new_order(self, params): ...
+        At most `concurrency` calls run at once, later messages wait.
+    '''
+    def deco(f):
+        f.job = {'kind': "on", 'channel': channel,
+                 'concurrency': concurrency}
+        return f
+    return deco
+
+
+class Job:
+    def __init__(self, name, func, kind, concurrency=1, interval=None,
+                 jitter=0, delay=0, channel=None):
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.concurrency = concurrency
+        self.interval = interval
+        self.jitter = jitter
+        self.delay = delay
+        self.channel = channel
+        self.running = 0
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.late = 0
+        self.last = 0
+        self.slots = None
+
+    def stats(self):
+        return {'kind': self.kind,
+                'running': self.running,
+                'runs': self.runs,
+                'failures': self.failures,
+                'skipped': self.skipped,
+                'late': round(self.late, 4),
+                'last': round(self.last, 4)}
+
+
+class JobScheduler:
+    '''
+        Runs the @every / @on jobs declared on a Mikro instance.
+    '''
+    def __init__(self, mikro, prefix):
+        self.mikro = mikro
+        self.loop = mikro.loop
+        self.prefix = prefix
+        self.jobs = self.collect(mikro)
+        self.tasks = []
+        self.runs = set()
+
+    @staticmethod
+    def collect(obj):
+        jobs = []
+        for name, func in inspect.getmembers(type(obj), inspect.isfunction):
+            opts = getattr(func, "job", None)
+            if opts is not None:
+                opts = dict(opts)
+                jobs.append(Job(name, getattr(obj, name), opts.pop('kind'),
+                                **opts))
+        return jobs
+
+    def start(self):
+        # the timers and the listener are restarted if they ever fail
+        group = self.mikro.tasks
+        for job in self.jobs:
+            if job.kind == "every":
+                self.tasks.append(group.spawn(
+                    "every:{}".format(job.name),
+                    lambda job=job: self.periodic(job), restart="on-failure"))
+        events = [job for job in self.jobs if job.kind == "on"]
+        if events:
+            self.tasks.append(group.spawn(
+                "on:{}".format(type(self.mikro).__name__),
+                lambda: self.listen(events), restart="on-failure"))
+
+    def stop(self):
+        for t in self.tasks:
+            t.cancel()
+        self.tasks = []
+        for t in self.runs:
+            t.cancel()
+
+    async def periodic(self, job):
+        base = self.loop.time() + job.delay
+        n = 0
+        while True:
+            due = base + n * job.interval
+            if job.jitter:
+                due += uniform(0, job.jitter)
+            wait = due - self.loop.time()
+            if wait > 0:
+                await ai.sleep(wait)
+            job.late = max(self.loop.time() - due, 0)
+            if job.running >= job.concurrency:
+                job.skipped += 1
+            else:
+                self.launch(job)
+            # next slot after now, missed ones are dropped
+            n = max(n + 1, int((self.loop.time() - base) / job.interval) + 1)
+
+    def launch(self, job, *args):
+        # runs are kept until done, stop() cancels the ones still going
+        job.running += 1
+        task = self.loop.create_task(self.run(job, *args))
+        self.runs.add(task)
+        task.add_done_callback(lambda t: self.done(job, t))
+        return task
+
+    def done(self, job, task):
+        job.running -= 1
+        self.runs.discard(task)
+
+    async def run(self, job, *args):
+        start = self.loop.time()
+        try:
+            await job.func(*args)
+            job.runs += 1
+        except ai.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            print("{}.{}: {}".format(
+                type(self.mikro).__name__, job.name, e))
+        finally:
+            job.last = self.loop.time() - start
+
+    async def listen(self, jobs):
+        while self.mikro.redis is None:
+            await ai.sleep(0.3)
+        patterns = {}
+        for job in jobs:
+            pattern = "{}-{}".format(self.prefix, job.channel)
+            patterns.setdefault(pattern, []).append(job)
+            job.slots = ai.Semaphore(job.concurrency)
+        patterns = list(patterns.items())
+        channels = await self.mikro.redis.psubscribe(
+            *[pattern for pattern, _ in patterns])
+        await ai.gather(*[self.read(ch, jobs)
+                          for ch, (_, jobs) in zip(channels, patterns)])
+
+    async def read(self, ch, jobs):
+        while await ch.wait_message():
+            try:
+                _, params = await ch.get_json()
+            except Exception as e:
+                print(e)
+                continue
+            for job in jobs:
+                await job.slots.acquire()
+                task = self.launch(job, params)
+                task.add_done_callback(
+                    lambda t, s=job.slots: s.release())
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
@@ -10,15 +10,29 @@ if cpath not in sys.path:
     sys.path.append(cpath)
 
 import conf
+from bee.core.monitor import LoopMonitor
+from bee.core.jobs import JobScheduler
+from bee.core.tasks import TaskGroup, Fanout
 
 class Mikro:
     def __init__(self):
         self.redis = None
         self.loop = ai.get_event_loop()
         self.running = False
+        self.stopped = ai.Event()
+        self.tasks = TaskGroup(self.loop)
+        self.fanout = getattr(conf, "TASK_FANOUT", 100)
+        self.scheduler = JobScheduler(self, conf.REDIS_MPATTERN)
+        self.monitor = None
+        if getattr(conf, "LOOP_MONITOR", True):
+            self.monitor = LoopMonitor(
+                self.loop,
+                interval=getattr(conf, "LOOP_MONITOR_INTERVAL", 0.1),
+                threshold=getattr(conf, "LOOP_STALL_THRESHOLD", 0.25))
         if hasattr(self, "db_on"):
             ai.gather(ai.async(self.setup_db()))
-        if hasattr(self, "redis_on"):
+        if hasattr(self, "redis_on") or \
+                any(job.kind == "on" for job in self.scheduler.jobs):
             ai.gather(ai.async(self.setup_redis()))
 
     def setup(self, *a, **k):
@@ -47,43 +61,75 @@ class Mikro:
             encoding="utf-8")
 
     def start(self):
-        self.running = True
-        tasks = ai.async(self.async_setup())
-        self.loop.run_until_complete(tasks)
-        ai.gather(ai.async(self.check_status()))
-        tasks = ai.gather(ai.async(self.process()))
-        try:
-            self.loop.run_until_complete(tasks)
-        except KeyboardInterrupt:
-            ctasks = ai.gather(ai.async(self.clean()))
-            self.loop.run_until_complete(ctasks)
-            tasks.cancel()
-            self.loop.run_forever()
-            self.loop.close()
-            tasks.exception()
-        finally:
-            self.loop.close()
-
-    @staticmethod
-    def get_tasks():
-        fns = [t for t in ai.Task.all_tasks() if t._state == "FINISHED"]
-        for t in fns:
-            ai.Task._all_tasks.remove(t)
-        return ai.Task.all_tasks()
+        run(self)
 
-    def apply_tasks(self, items, **kwargs):
+    def stop(self):
+        self.running = False
+        self.stopped.set()
+
+    def spawn(self, name, factory, restart="on-failure", backoff=1,
+              max_backoff=60):
+        '''
+            Starts a supervised task, see bee.core.tasks.TaskGroup:
+                self.spawn("sync", lambda: self.sync_loop(), restart="always")
+        '''
+        return self.tasks.spawn(name, factory, restart=restart,
+                                backoff=backoff, max_backoff=max_backoff)
+
+    def get_tasks(self):
+        return self.tasks.running()
+
+    def apply_tasks(self, items, limit=None, **kwargs):
+        fanout = Fanout(limit or self.fanout)
         return ai.wait(
-            [self.loop.create_task(item) for item in items], **kwargs)
+            [self.tasks.spawn(None, fanout.run(item)) for item in items],
+            **kwargs)
 
     async def gather(self, item):
-        return ai.gather(self.loop.create_task(item))
+        return ai.gather(self.tasks.spawn(None, item))
 
     async def sleep(self, time):
         await ai.sleep(time)
 
     async def process(self):
-        while self.running:
-            await self.update()
+        self.scheduler.start()
+        try:
+            if type(self).update is Mikro.update:
+                # only @every / @on jobs, nothing to poll
+                await self.stopped.wait()
+            else:
+                while self.running:
+                    await self.update()
+        finally:
+            self.scheduler.stop()
+            await self.tasks.stop()
 
     async def update(self):
         pass
+
+
+def run(*workers):
+    '''
+        Runs one or more Mikro instances on the shared loop:
+            run(Cleaner(), Mailer())
+    '''
+    loop = workers[0].loop
+    for w in workers:
+        w.running = True
+    loop.run_until_complete(ai.gather(*[w.async_setup() for w in workers]))
+    if workers[0].monitor:
+        loop.create_task(workers[0].monitor.sample())
+    for w in workers:
+        loop.create_task(w.check_status())
+    tasks = ai.gather(*[w.process() for w in workers])
+    try:
+        loop.run_until_complete(tasks)
+    except KeyboardInterrupt:
+        loop.run_until_complete(ai.gather(*[w.clean() for w in workers]))
+        tasks.cancel()
+        try:
+            loop.run_until_complete(tasks)
+        except ai.CancelledError:
+            pass
+    finally:
+        loop.close()
@@ -0,0 +1,110 @@
+import asyncio as ai
+import sys
+import threading
+import traceback
+from time import monotonic, sleep
+from bee.core.stats import Histogram
+
+current_task = getattr(ai, "current_task", None) or ai.Task.current_task
+
+
+def task_name(task):
+    if task is None:
+        return "-"
+    coro = task.get_coro() if hasattr(task, "get_coro") else \
+        getattr(task, "_coro", None)
+    return getattr(coro, "__qualname__", None) or repr(task)[:100]
+
+
+class LoopMonitor:
+    '''
+        Measures loop scheduling delay every `interval` seconds. A watchdog
+        thread notices when the loop hasn't come back for `threshold`
+        seconds and logs the loop thread's stack with the running task
+        (named by `describe(task)`, e.g. the action) once per stall.
+        Lag and stalls are also recorded in `stats` ("loop" / "lag" and
+        "<culprit>" / "stall") when given.
+    '''
+    def __init__(self, loop, interval=0.1, threshold=0.25, describe=None,
+                 stats=None, depth=15):
+        self.loop = loop
+        self.interval = interval
+        self.threshold = threshold
+        self.describe = describe
+        self.histograms = stats
+        self.depth = depth
+        self.lag = Histogram()
+        self.stalls = 0
+        self.culprits = {}
+        self.last = None
+        self.current = None
+        self.beat = monotonic()
+        self.thread_id = None
+        self.running = False
+
+    async def sample(self):
+        self.thread_id = threading.get_ident()
+        self.running = True
+        threading.Thread(target=self.watch, name="bee-monitor",
+                         daemon=True).start()
+        try:
+            while True:
+                start = monotonic()
+                await ai.sleep(self.interval)
+                self.beat = now = monotonic()
+                lag = max(now - start - self.interval, 0)
+                self.lag.record(lag)
+                if self.histograms is not None:
+                    self.histograms.record("loop", "lag", lag)
+                if lag >= self.threshold:
+                    self.stalled(lag)
+        finally:
+            self.running = False
+
+    def stalled(self, lag):
+        stall, self.current = self.current, None
+        if stall is None:
+            stall = {'culprit': "-", 'stack': ""}
+        stall['seconds'] = round(lag, 3)
+        self.stalls += 1
+        self.culprits[stall['culprit']] = \
+            self.culprits.get(stall['culprit'], 0) + 1
+        self.last = stall
+        if self.histograms is not None:
+            self.histograms.record(stall['culprit'], "stall", lag)
+        print("Loop blocked for {:.3f}s by {}".format(lag, stall['culprit']))
+
+    def watch(self):
+        seen = None
+        while self.running:
+            sleep(self.interval)
+            beat = self.beat
+            if beat == seen or \
+                    monotonic() - beat < self.interval + self.threshold:
+                continue
+            # report every stall once, while it is still going on
+            seen = beat
+            self.current = self.capture()
+            print("Loop blocked by {}, at:\n{}".format(
+                self.current['culprit'], self.current['stack']))
+
+    def capture(self):
+        frame = sys._current_frames().get(self.thread_id)
+        stack = "".join(traceback.format_stack(frame, limit=self.depth)) \
+            if frame is not None else ""
+        task = current_task(self.loop)
+        culprit = None
+        if task is not None and self.describe is not None:
+            culprit = self.describe(task)
+        return {'culprit': culprit or task_name(task), 'stack': stack}
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {'lag': self.lag.summary(),
+                'stalls': self.stalls,
+                'culprits': self.culprits,
+                'last': {'culprit': self.last['culprit'],
+                         'seconds': self.last['seconds']}
+                if self.last else None}
@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+
+
+class Offload:
+    '''
+        Runs sync (_sc) and static (_st) actions marked with
+        bee.apps.cmd.threaded (or all of them with conf.SYNC_OFFLOAD) in a
+        pool of `threads` threads (0 runs them inline), and the ones marked
+        with bee.apps.cmd.cpu in a pool of `processes` processes. Pools are
+        created on first use.
+    '''
+    def __init__(self, app, threads=8, processes=None):
+        self.app = app
+        self.workers = threads
+        self.threads = None
+        self.size = processes
+        self.processes = None
+        self.thread_calls = 0
+        self.process_calls = 0
+
+    async def thread(self, f, *args, **kw):
+        self.thread_calls += 1
+        if not self.workers:
+            return f(*args, **kw)
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="bee-sync")
+        return await self.app.loop.run_in_executor(
+            self.threads, partial(f, *args, **kw))
+
+    async def process(self, f, *args, **kw):
+        if self.processes is None:
+            self.processes = ProcessPoolExecutor(self.size)
+        self.process_calls += 1
+        return await self.app.loop.run_in_executor(
+            self.processes, partial(f, *args, **kw))
+
+    async def cpu(self, inst, name, data):
+        # only the function and its params cross the process boundary
+        result = await self.process(getattr(type(inst), name), None, **data)
+        if isinstance(result, dict):
+            inst.send(**result)
+
+    def shutdown(self):
+        if self.threads is not None:
+            self.threads.shutdown(wait=False)
+        if self.processes is not None:
+            self.processes.shutdown(wait=False)
+
+    def stats(self):
+        return {'threads': self.workers if self.threads else 0,
+                'processes': self.size if self.processes else 0,
+                'thread_calls': self.thread_calls,
+                'process_calls': self.process_calls}
@@ -0,0 +1,67 @@
+import re
+from itertools import product
+
+
+class Rule:
+    def __init__(self, item):
+        self.m = item.get("m") or None
+        self.c = item.get("c") or None
+        self.f = item.get("f") or None
+        self.params = [(k, re.compile(v))
+                       for k, v in (item.get("params") or {}).items()]
+
+    @property
+    def key(self):
+        return (self.m, self.c, self.f)
+
+    def match_params(self, data):
+        for k, rx in self.params:
+            v = data.get(k)
+            if not v or not rx.match(str(v)):
+                return False
+        return True
+
+
+class PermissionSet:
+    '''
+        Compiled form of a permission list (conf.FREE_ACTIONS, User.perms).
+        Rules are bucketed by (m, c, f), None being the wildcard, and
+        lookups are memoized per (m, c, f):
+            True -> a parameter-free rule matches
+            tuple -> rules whose params still have to be checked
+    '''
+    def __init__(self, perms, cache_size=4096):
+        self.buckets = {}
+        for item in perms or []:
+            rule = Rule(item)
+            self.buckets.setdefault(rule.key, []).append(rule)
+        self.cache = {}
+        self.cache_size = cache_size
+
+    def __len__(self):
+        return sum(len(b) for b in self.buckets.values())
+
+    def lookup(self, m, c, f):
+        key = (m, c, f)
+        res = self.cache.get(key)
+        if res is None:
+            rules = []
+            for k in set(product((m, None), (c, None), (f, None))):
+                rules.extend(self.buckets.get(k, []))
+            if any(not r.params for r in rules):
+                res = True
+            else:
+                res = tuple(rules)
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[key] = res
+        return res
+
+    def match(self, action):
+        res = self.lookup(action.m, action.c, action.f)
+        if res is True:
+            return True
+        for rule in res:
+            if rule.match_params(action.data):
+                return True
+        return None
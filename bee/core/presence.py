@@ -0,0 +1,142 @@
+import asyncio as ai
+from time import time, monotonic
+from bee.core.utils import BJSON
+from bee.core.transport import node_id
+from bee.core.publisher import Flusher
+
+
+class Presence(Flusher):
+    '''
+        Cluster wide uid -> node ids registry kept in redis sorted sets
+        ("<REDIS_MPATTERN>:presence:<uid>", member: node id, score: expiry)
+        and refreshed by a heartbeat. Lookups go through a short lived
+        local cache. Every node listens on its own
+        "<REDIS_MPATTERN>:node:<node id>" channel (outside the "bee-*"
+        pattern) for sends targeting its users.
+    '''
+    def __init__(self, app, conf):
+        self.app = app
+        self.node = node_id(conf)
+        self.prefix = "{}:presence:".format(conf.REDIS_MPATTERN)
+        self.channel_prefix = "{}:node:".format(conf.REDIS_MPATTERN)
+        self.channel = "{}{}".format(self.channel_prefix, self.node)
+        self.ttl = getattr(conf, "PRESENCE_TTL", 30)
+        self.cache_ttl = getattr(conf, "PRESENCE_CACHE_TTL", 2)
+        self.cache = {}
+        self.changes = {}
+        self.remote_sends = 0
+        self.received = 0
+
+    def key(self, uid):
+        return "{}{}".format(self.prefix, uid)
+
+    def add(self, uid):
+        self.change(uid, True)
+
+    def remove(self, uid):
+        self.change(uid, False)
+
+    def change(self, uid, online):
+        self.changes[uid] = online
+        self.cache.pop(uid, None)
+        self.schedule()
+
+    def pending(self):
+        return bool(self.changes)
+
+    async def write(self):
+        changes, self.changes = self.changes, {}
+        expiry = time() + self.ttl
+        pipe = self.app.redis.pipeline()
+        for uid, online in changes.items():
+            if online:
+                self.refresh(pipe, uid, expiry)
+            else:
+                pipe.zrem(self.key(uid), self.node)
+        await pipe.execute()
+
+    def refresh(self, pipe, uid, expiry):
+        key = self.key(uid)
+        pipe.zadd(key, expiry, self.node)
+        pipe.zremrangebyscore(key, max=time())
+        pipe.expire(key, self.ttl * 2)
+
+    async def heartbeat(self):
+        while True:
+            await ai.sleep(self.ttl / 3.0)
+            if self.app.redis is None:
+                continue
+            uids = list(self.app.uids)
+            expiry = time() + self.ttl
+            for i in range(0, len(uids), 1000):
+                pipe = self.app.redis.pipeline()
+                for uid in uids[i:i + 1000]:
+                    self.refresh(pipe, uid, expiry)
+                try:
+                    await pipe.execute()
+                except Exception as e:
+                    print(e)
+
+    async def nodes(self, uid):
+        item = self.cache.get(uid)
+        now = monotonic()
+        if item is not None and item[0] > now:
+            return item[1]
+        nodes = set(await self.app.redis.zrangebyscore(
+            self.key(uid), min=time()))
+        self.cache[uid] = (now + self.cache_ttl, nodes)
+        if len(self.cache) > 100000:
+            self.cache = {}
+        return nodes
+
+    async def is_online(self, uid):
+        if uid in self.app.uids:
+            return True
+        return bool(await self.nodes(uid))
+
+    async def send(self, uid, kw):
+        try:
+            nodes = await self.nodes(uid)
+        except Exception as e:
+            print(e)
+            return
+        payload = None
+        for node in nodes:
+            if node == self.node:
+                continue
+            if payload is None:
+                payload = BJSON.encode({'uid': uid, 'kw': kw})
+            self.remote_sends += 1
+            self.app.publisher.put(
+                "{}{}".format(self.channel_prefix, node), payload)
+
+    async def listener(self):
+        while self.app.redis is None:
+            await ai.sleep(0.3)
+        res = await self.app.redis.subscribe(self.channel)
+        ch = res[0]
+        while await ch.wait_message():
+            try:
+                msg = await ch.get_json()
+            except Exception as e:
+                print(e)
+                continue
+            self.received += 1
+            clients = self.app.uids.get(msg['uid'])
+            if clients:
+                self.app.deliver(list(clients), msg['kw'])
+
+    async def clear(self):
+        if self.app.redis is None or not self.app.uids:
+            return
+        pipe = self.app.redis.pipeline()
+        for uid in self.app.uids:
+            pipe.zrem(self.key(uid), self.node)
+        await pipe.execute()
+
+    def stats(self):
+        return {'node': self.node,
+                'local_uids': len(self.app.uids),
+                'cached': len(self.cache),
+                'remote_sends': self.remote_sends,
+                'received': self.received}
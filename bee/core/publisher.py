@@ -0,0 +1,106 @@
+import asyncio as ai
+from collections import deque
+
+
+class Flusher:
+    '''
+        Coalesces schedule() calls (from any thread) into one flush task on
+        the app loop, which calls write() until pending() is false. Used by
+        Publisher and Presence.
+    '''
+    scheduled = False
+
+    def pending(self):
+        return False
+
+    async def write(self):
+        pass
+
+    def schedule(self):
+        if not self.scheduled:
+            self.scheduled = True
+            self.app.loop.call_soon_threadsafe(self.start)
+
+    def start(self):
+        self.app.loop.create_task(self.flush())
+
+    async def flush(self):
+        try:
+            while self.pending():
+                if self.app.redis is None:
+                    await ai.sleep(0.1)
+                    continue
+                await self.write()
+        except Exception as e:
+            print(e)
+        finally:
+            self.scheduled = False
+        # items put from another thread while the last write ran
+        if self.pending():
+            self.schedule()
+
+
+class Publisher(Flusher):
+    '''
+        Buffers outgoing redis messages and flushes them through one
+        pipeline per loop tick (at most `batch` messages per pipeline).
+        Stream backed channels (App.streams) are written with XADD.
+        When `max_queue` messages are waiting new ones are dropped, as are
+        the messages of a pipeline that fails; both are counted in `dropped`.
+    '''
+    def __init__(self, app, batch=100, max_queue=10000):
+        self.app = app
+        self.batch = batch
+        self.max_queue = max_queue
+        self.buffer = deque()
+        self.flushes = 0
+        self.published = 0
+        self.dropped = 0
+        self.last_size = 0
+        self.max_size = 0
+
+    def put(self, cname, payload):
+        if len(self.buffer) >= self.max_queue:
+            self.dropped += 1
+            return False
+        self.buffer.append((cname, payload))
+        self.schedule()
+        return True
+
+    def pending(self):
+        return bool(self.buffer)
+
+    async def write(self):
+        size = min(len(self.buffer), self.batch)
+        items = [self.buffer.popleft() for _ in range(size)]
+        pipe = self.app.redis.pipeline()
+        streams = self.app.streams
+        for cname, payload in items:
+            if streams and streams.handles(cname):
+                streams.add(pipe, cname, payload)
+            else:
+                pipe.publish(cname, payload)
+        try:
+            await pipe.execute()
+        except Exception as e:
+            self.dropped += size
+            print("{} messages dropped: {}".format(size, e))
+            return
+        self.flushes += 1
+        self.published += size
+        self.last_size = size
+        if size > self.max_size:
+            self.max_size = size
+
+    def busy(self):
+        return self.scheduled or bool(self.buffer)
+
+    def stats(self):
+        return {'depth': len(self.buffer),
+                'flushes': self.flushes,
+                'published': self.published,
+                'avg_flush': self.published // self.flushes
+                if self.flushes else 0,
+                'last_flush': self.last_size,
+                'max_flush': self.max_size,
+                'dropped': self.dropped}
@@ -0,0 +1,145 @@
+import asyncio as ai
+from itertools import count
+from time import perf_counter
+
+
+class Job:
+    def __init__(self, name, factory, client=None, timeout=None,
+                 stats=False):
+        self.name = name
+        self.factory = factory
+        self.client = client
+        self.timeout = timeout
+        self.stats = stats
+        self.queued = perf_counter()
+        self.task = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+
+
+class ActionScheduler:
+    '''
+        Runs action coroutines on a fixed number of workers fed by a bounded
+        priority queue. submit() returns False when the job is shed (queue
+        full or the client is over its limit), the caller replies with an
+        error. With a `timeout` (conf.ACTION_TIMEOUT, off by default) jobs
+        are cancelled after that many seconds unless they set their own
+        (bee.apps.cmd.timeout), so long actions can't hold every worker.
+    '''
+    PRIORITIES = {"console": 0, "ws": 1, "web": 1}
+
+    def __init__(self, app, workers=64, per_client=16, queue_size=1024,
+                 timeout=None):
+        self.app = app
+        self.size = workers
+        self.per_client = per_client
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.queue = None
+        self.workers = []
+        self.jobs = {}
+        self.names = {}
+        self.seq = count()
+        self.active = 0
+        self.closing = False
+        self.shed = 0
+        self.timeouts = 0
+
+    def start(self):
+        self.queue = ai.PriorityQueue(maxsize=self.queue_size)
+        self.workers = [self.app.loop.create_task(self.worker())
+                        for _ in range(self.size)]
+
+    def stop(self):
+        for w in self.workers:
+            w.cancel()
+        self.workers = []
+        for jobs in list(self.jobs.values()):
+            for job in list(jobs):
+                job.cancel()
+        self.jobs = {}
+
+    def submit(self, name, factory, client=None, priority="ws", timeout=None,
+               stats=False):
+        if self.closing:
+            self.shed += 1
+            return False
+        if not self.workers:
+            self.start()
+        jobs = self.jobs.get(client)
+        if jobs is not None and client is not None and \
+                len(jobs) >= self.per_client:
+            self.shed += 1
+            return False
+        if timeout is None:
+            timeout = self.timeout
+        job = Job(name, factory, client=client, timeout=timeout or None,
+                  stats=stats)
+        try:
+            self.queue.put_nowait(
+                (self.PRIORITIES.get(priority, 1), next(self.seq), job))
+        except ai.QueueFull:
+            self.shed += 1
+            return False
+        self.jobs.setdefault(client, set()).add(job)
+        return True
+
+    def busy(self):
+        return bool(self.active or (self.queue and self.queue.qsize()))
+
+    def cancel(self, client):
+        for job in self.jobs.pop(client, ()):
+            job.cancel()
+
+    def done(self, job):
+        jobs = self.jobs.get(job.client)
+        if jobs is not None:
+            jobs.discard(job)
+            if not jobs:
+                self.jobs.pop(job.client)
+
+    async def worker(self):
+        while True:
+            _, _, job = await self.queue.get()
+            try:
+                if not job.cancelled:
+                    await self.run(job)
+            finally:
+                self.done(job)
+                self.queue.task_done()
+
+    async def run(self, job):
+        self.active += 1
+        start = perf_counter()
+        if job.stats:
+            self.app.stats.record(job.name, "queue", start - job.queued)
+        try:
+            job.task = self.app.loop.create_task(job.factory())
+            self.names[job.task] = job.name
+            await ai.wait_for(job.task, job.timeout)
+        except ai.TimeoutError:
+            self.timeouts += 1
+            self.app.publish("error", desc="Action timed out!",
+                             detail=job.name, client=job.client)
+        except ai.CancelledError:
+            if not job.cancelled:
+                raise
+        except Exception as e:
+            self.app.publish("exp", desc=str(e), client=job.client)
+        finally:
+            self.active -= 1
+            self.names.pop(job.task, None)
+            if job.stats:
+                self.app.stats.record(
+                    job.name, "action", perf_counter() - start)
+
+    def stats(self):
+        return {'queued': self.queue.qsize() if self.queue else 0,
+                'running': self.active,
+                'clients': len(self.jobs),
+                'shed': self.shed,
+                'timeouts': self.timeouts}
@@ -0,0 +1,95 @@
+from time import perf_counter
+
+
+class Histogram:
+    '''
+        HDR-style latency histogram in microseconds: values below 2^SUB_BITS
+        are exact, above that each power of two is split in 2^(SUB_BITS-1)
+        buckets (~3% precision).
+    '''
+    SUB_BITS = 6
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds):
+        v = int(seconds * 1000000)
+        shift = v.bit_length() - self.SUB_BITS
+        key = (shift, v >> shift) if shift > 0 else (0, v)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += v
+        if v > self.max:
+            self.max = v
+
+    def percentile(self, p):
+        if not self.count:
+            return 0
+        target = self.count * p / 100.0
+        seen = 0
+        for shift, m in sorted(self.counts, key=lambda k: k[1] << k[0]):
+            seen += self.counts[(shift, m)]
+            if seen >= target:
+                return min(((m + 1) << shift) - 1, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count,
+                'avg': self.total // self.count if self.count else 0,
+                'p50': self.percentile(50),
+                'p90': self.percentile(90),
+                'p99': self.percentile(99),
+                'max': self.max}
+
+
+class Stats:
+    '''
+        Per action (m.c.f) and stage latency histograms, values are reported
+        in microseconds.
+    '''
+    STAGES = ("parse", "shortcut", "load", "permission", "queue", "action",
+              "hook", "lag", "stall")
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = {}
+
+    @staticmethod
+    def now():
+        return perf_counter()
+
+    def record(self, name, stage, seconds):
+        if not self.enabled:
+            return
+        stages = self.metrics.get(name)
+        if stages is None:
+            stages = self.metrics[name] = {}
+        hist = stages.get(stage)
+        if hist is None:
+            hist = stages[stage] = Histogram()
+        hist.record(seconds)
+
+    def record_all(self, name, timings):
+        for stage, seconds in timings.items():
+            self.record(name, stage, seconds)
+
+    def reset(self):
+        self.metrics = {}
+
+    def report(self):
+        return {name: {stage: hist.summary() for stage, hist in stages.items()}
+                for name, stages in self.metrics.items()}
+
+    def rows(self):
+        rows = [["action", "stage", "count", "avg", "p50", "p90", "p99", "max"]]
+        for name in sorted(self.metrics):
+            stages = self.metrics[name]
+            for stage in self.STAGES:
+                if stage in stages:
+                    s = stages[stage].summary()
+                    rows.append([name, stage, s['count'], s['avg'], s['p50'],
+                                 s['p90'], s['p99'], s['max']])
+        return rows
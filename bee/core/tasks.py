@@ -0,0 +1,146 @@
+import asyncio as ai
+from itertools import count
+from time import monotonic
+
+RESTART = ("never", "on-failure", "always")
+
+
+class TaskInfo:
+    def __init__(self, name, factory, restart, backoff, max_backoff):
+        self.name = name
+        self.factory = factory
+        self.restart = restart
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.task = None
+        self.starts = 0
+        self.failures = 0
+        self.runtime = 0
+        self.last_error = None
+
+    def stats(self):
+        return {'running': self.task is not None and not self.task.done(),
+                'restart': self.restart,
+                'starts': self.starts,
+                'failures': self.failures,
+                'runtime': round(self.runtime, 3),
+                'last_error': self.last_error}
+
+
+class TaskGroup:
+    '''
+        Named, supervised tasks. `factory` returns a new coroutine for each
+        (re)start; restart is one of "never", "on-failure" or "always",
+        restarts wait backoff * 2^(failures in a row - 1) seconds (backoff
+        after a clean exit), at most max_backoff. A plain coroutine can be
+        given for restart="never". Finished named tasks stay in the registry
+        with their counters, unnamed ones only count in the totals.
+    '''
+    def __init__(self, loop):
+        self.loop = loop
+        self.registry = {}
+        self.ids = count()
+        self.started = 0
+        self.failed = 0
+
+    def spawn(self, name, factory, restart="never", backoff=1,
+              max_backoff=60):
+        if restart not in RESTART:
+            raise ValueError("restart must be one of {}".format(RESTART))
+        if restart != "never" and not callable(factory):
+            raise ValueError("Restarting {} needs a factory".format(name))
+        unnamed = name is None
+        if unnamed:
+            name = "task-{}".format(next(self.ids))
+        info = self.registry.get(name)
+        if info is not None and info.task is not None and \
+                not info.task.done():
+            raise ValueError("Task {} is already running".format(name))
+        info = self.registry[name] = TaskInfo(
+            name, factory, restart, backoff, max_backoff)
+        info.task = self.loop.create_task(self.supervise(info))
+        if unnamed:
+            info.task.add_done_callback(
+                lambda t: self.registry.pop(name, None))
+        return info.task
+
+    async def supervise(self, info):
+        failed = 0
+        while True:
+            info.starts += 1
+            self.started += 1
+            start = monotonic()
+            try:
+                coro = info.factory() if callable(info.factory) \
+                    else info.factory
+                result = await coro
+                failed = 0
+            except ai.CancelledError:
+                raise
+            except Exception as e:
+                failed += 1
+                info.failures += 1
+                self.failed += 1
+                info.last_error = repr(e)
+                print("Task {} failed: {!r}".format(info.name, e))
+                if info.restart == "never":
+                    raise
+            finally:
+                info.runtime += monotonic() - start
+            if info.restart == "never" or \
+                    (info.restart == "on-failure" and not failed):
+                return result
+            delay = info.backoff * 2 ** (failed - 1) if failed \
+                else info.backoff
+            await ai.sleep(min(delay, info.max_backoff))
+
+    def get(self, name):
+        return self.registry.get(name)
+
+    def cancel(self, name):
+        info = self.registry.get(name)
+        if info is not None and info.task is not None:
+            info.task.cancel()
+
+    def running(self):
+        return [info.task for info in self.registry.values()
+                if info.task is not None and not info.task.done()]
+
+    def forget(self):
+        # drops finished tasks from the registry
+        self.registry = {name: info for name, info in self.registry.items()
+                         if info.task is None or not info.task.done()}
+
+    async def stop(self):
+        tasks = self.running()
+        for t in tasks:
+            t.cancel()
+        await ai.gather(*tasks, return_exceptions=True)
+
+    def stats(self):
+        return {'started': self.started,
+                'failed': self.failed,
+                'running': len(self.running()),
+                'tasks': {name: info.stats()
+                          for name, info in self.registry.items()}}
+
+
+class Fanout:
+    # runs at most `limit` of the given coroutines at a time
+    def __init__(self, limit):
+        self.slots = ai.Semaphore(limit)
+        self.active = 0
+        self.done = 0
+        self.failures = 0
+
+    async def run(self, coro):
+        async with self.slots:
+            self.active += 1
+            try:
+                return await coro
+            except Exception:
+                self.failures += 1
+                raise
+            finally:
+                self.active -= 1
+                self.done += 1
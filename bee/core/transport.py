@@ -0,0 +1,235 @@
+import asyncio as ai
+import socket
+import os
+from time import monotonic
+import aioredis
+from bee.core.utils import BJSON
+
+
+def node_id(conf):
+    if getattr(conf, "NODE_ID", None):
+        return conf.NODE_ID
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+
+def consumer_name(conf):
+    # a configured name survives restarts, so own pending entries are
+    # replayed, otherwise entries of dead consumers are claimed
+    return getattr(conf, "STREAM_CONSUMER", None) or node_id(conf)
+
+
+class StreamReader:
+    '''
+        Consumer group reads over `conn`: replay() yields this consumer's
+        own pending entries (left by a restart), read() the new ones and
+        claim() takes over entries idle for `claim_idle` ms, including the
+        ones of dead consumers and this consumer's own failed entries.
+        Entries delivered `max_deliveries` times are copied to the dead
+        letter stream `dead[stream]` if there is one, and acked. Entries
+        are (stream, id, fields) tuples.
+    '''
+    def __init__(self, conn, streams, group, consumer, batch=100,
+                 block=1000, claim_idle=60000, max_deliveries=10, dead=None):
+        self.conn = conn
+        self.streams = streams
+        self.group = group
+        self.consumer = consumer
+        self.batch = batch
+        self.block = int(block)
+        self.claim_idle = int(claim_idle)
+        self.max_deliveries = max_deliveries
+        self.dead = dead or {}
+        self.claimed = 0
+        self.dropped = 0
+
+    async def setup(self):
+        for stream in self.streams:
+            try:
+                await self.conn.xgroup_create(
+                    stream, self.group, latest_id='$', mkstream=True)
+            except aioredis.ReplyError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+    async def replay(self):
+        entries = []
+        for stream in self.streams:
+            last = '0'
+            while True:
+                res = await self.conn.xread_group(
+                    self.group, self.consumer, [stream], timeout=None,
+                    count=self.batch, latest_ids=[last])
+                if not res:
+                    break
+                entries.extend(res)
+                last = res[-1][1]
+        return entries
+
+    async def read(self):
+        return await self.conn.xread_group(
+            self.group, self.consumer, self.streams, timeout=self.block,
+            count=self.batch, latest_ids=['>'] * len(self.streams))
+
+    async def claim(self):
+        entries = []
+        for stream in self.streams:
+            pending = await self.conn.xpending(
+                stream, self.group, '-', '+', self.batch)
+            ids = []
+            dead = []
+            for mid, consumer, idle, deliveries in pending:
+                if idle < self.claim_idle:
+                    continue
+                if deliveries >= self.max_deliveries:
+                    dead.append(mid)
+                else:
+                    ids.append(mid)
+            if dead:
+                await self.bury(stream, dead)
+            if ids:
+                messages = await self.conn.xclaim(
+                    stream, self.group, self.consumer, self.claim_idle, *ids)
+                self.claimed += len(messages)
+                entries.extend((stream, mid, fields)
+                               for mid, fields in messages)
+        return entries
+
+    async def bury(self, stream, ids):
+        self.dropped += len(ids)
+        dead = self.dead.get(stream)
+        if dead:
+            for mid in ids:
+                res = await self.conn.xrange(stream, mid, mid)
+                if res:
+                    await self.conn.xadd(dead, res[0][1])
+        print("Dropping {} entries of {}, delivered {} times".format(
+            len(ids), stream, self.max_deliveries))
+        await self.conn.xack(stream, self.group, *ids)
+
+    async def ack(self, stream, ids):
+        if ids:
+            await self.conn.xack(stream, self.group, *ids)
+
+
+class StreamTransport:
+    '''
+        Channels listed in conf.STREAM_CHANNELS are written with XADD to
+        "<REDIS_MPATTERN>-<channel>" streams instead of PUBLISH, and read
+        through one consumer group per app type, so each message is handled
+        by a single process of the group. Messages are acked once all of
+        their hooks have run without errors; failed entries and the ones of
+        dead consumers are claimed after `claim_idle` ms (StreamReader).
+    '''
+    def __init__(self, app, conf, channels):
+        self.app = app
+        self.conf = conf
+        self.prefix = "{}-".format(conf.REDIS_MPATTERN)
+        self.streams = ["{}{}".format(self.prefix, c) for c in channels]
+        self.names = set(self.streams)
+        self.group = getattr(conf, "STREAM_GROUP", None) or \
+            "{}{}".format(self.prefix, app.app_type)
+        self.consumer = consumer_name(conf)
+        self.batch = getattr(conf, "STREAM_BATCH", 100)
+        self.block = getattr(conf, "STREAM_BLOCK", 1000)
+        self.maxlen = getattr(conf, "STREAM_MAXLEN", 100000)
+        self.claim_interval = getattr(conf, "STREAM_CLAIM_INTERVAL", 30)
+        self.conn = None
+        self.stopping = False
+        suffix = getattr(conf, "STREAM_DEAD_SUFFIX", None)
+        self.reader = StreamReader(
+            None, self.streams, self.group, self.consumer, batch=self.batch,
+            block=self.block,
+            claim_idle=getattr(conf, "STREAM_CLAIM_IDLE", 60000),
+            max_deliveries=getattr(conf, "STREAM_MAX_DELIVERIES", 10),
+            dead={s: "{}{}".format(s, suffix) for s in self.streams}
+            if suffix else None)
+        self.acks = {}
+        self.received = 0
+        self.acked = 0
+        self.errors = 0
+
+    def handles(self, cname):
+        return cname in self.names
+
+    def add(self, pipe, cname, payload):
+        pipe.xadd(cname, {'data': payload}, max_len=self.maxlen,
+                  exact_len=False)
+
+    async def setup(self):
+        # XREADGROUP blocks, so it gets its own connection
+        self.conn = await aioredis.create_redis(
+            (self.conf.REDIS_HOST, self.conf.REDIS_PORT), encoding="utf-8")
+        self.reader.conn = self.conn
+        await self.reader.setup()
+
+    async def consume(self):
+        delay = 1
+        while not self.stopping:
+            try:
+                await self.setup()
+                delay = 1
+                await self.run()
+            except ai.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                print("Stream consumer failed ({!r}), retrying in {}s".format(
+                    e, delay))
+                self.close()
+                await ai.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def run(self):
+        await self.handle(await self.reader.replay())
+        await self.handle(await self.reader.claim())
+        await self.flush_acks()
+        next_claim = monotonic() + self.claim_interval
+        while not self.stopping:
+            await self.handle(await self.reader.read())
+            await self.flush_acks()
+            if monotonic() >= next_claim:
+                await self.handle(await self.reader.claim())
+                await self.flush_acks()
+                next_claim = monotonic() + self.claim_interval
+
+    async def handle(self, messages):
+        for stream, mid, fields in messages:
+            self.received += 1
+            try:
+                params = BJSON.decode(fields['data'])
+            except Exception as e:
+                self.app.dispatcher.decode_errors += 1
+                print(e)
+                self.ack(stream, mid)
+                continue
+            await self.app.dispatcher.dispatch(
+                stream[len(self.prefix):], params,
+                ack=lambda s=stream, m=mid: self.ack(s, m))
+
+    def ack(self, stream, mid):
+        self.acks.setdefault(stream, []).append(mid)
+
+    async def flush_acks(self):
+        acks, self.acks = self.acks, {}
+        for stream, ids in acks.items():
+            await self.reader.ack(stream, ids)
+            self.acked += len(ids)
+
+    def stop(self):
+        # stops reading, acks of the messages still running are flushed by
+        # the caller once they are done
+        self.stopping = True
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def stats(self):
+        return {'consumer': self.consumer,
+                'group': self.group,
+                'received': self.received,
+                'acked': self.acked,
+                'claimed': self.reader.claimed,
+                'dead': self.reader.dropped,
+                'errors': self.errors}
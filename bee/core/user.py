@@ -1,9 +1,10 @@
 from datetime import datetime
-import re
+from bee.core.perms import PermissionSet
 
 class User:
-    def __init__(self, ref):
+    def __init__(self, ref, client=None):
         self.ref = ref
+        self.client = client
         self.uid = None
         self.is_authenticated = False
         self.entered = None
@@ -12,6 +13,8 @@ class User:
         self.user = None
         self.perms = []
         self.params = []
+        self.permset = PermissionSet([])
+        self.decisions = {}
     def __repr__(self):
         return "<User: uid: {}, is_authenticated: {}, entered: {}, ip: {}, app_type: {}, user: {}>".format(self.uid, self.is_authenticated, self.entered, self.ip, self.app_type, self.user)
 
@@ -23,6 +26,10 @@ class User:
         return None
 
     def login(self, uid, ip, app_type, user, perms=[], params=[], agent=None):
+        if self.client is not None:
+            if self.uid is not None and self.uid != uid:
+                self.ref.unbind_uid(self.client, self.uid)
+            self.ref.bind_uid(self.client, uid)
         self.is_authenticated = True
         self.uid = uid
         self.entered = datetime.now()
@@ -31,6 +38,7 @@ class User:
         self.user = user
         self.perms = perms
         self.params = params
+        self.reset_permissions()
 
     def check_session(self):
         pass
@@ -39,6 +47,8 @@ class User:
         if self.is_authenticated:
             signal = self.user.event_dict("offline")
             self.ref.publish("orm", **signal)
+        if self.client is not None and self.uid is not None:
+            self.ref.unbind_uid(self.client, self.uid)
         self.is_authenticated = False
         self.uid = None
         self.entered = None
@@ -46,35 +56,36 @@ class User:
         self.app_type = None
         self.user = None
         self.perms = []
+        self.reset_permissions()
+
+    def reset_permissions(self):
+        self.permset = PermissionSet(self.perms)
+        self.decisions = {}
 
     @classmethod
     def _check_per(cls, perms, action):
-        for fa in perms:
-            scheck = []
-            if "m" in fa and fa["m"]:
-                scheck.append(fa["m"] == action.m)
-            if "c" in fa and fa["c"]:
-                scheck.append(fa["c"] == action.c)
-            if "f" in fa and fa["f"]:
-                scheck.append(fa["f"] == action.f)
-            if "params" in fa and fa['params']:
-                for k, v in fa['params'].items():
-                    if k in action.data and action.data.get(k):
-                        scheck.append(True if re.match(v, str(action.data.get(k))) else False)
-                    else:
-                        scheck.append(False)
-            if all(scheck):
-                return True
-        return None
+        return PermissionSet(perms).match(action)
+
+    def _lookup(self, action):
+        key = (action.m, action.c, action.f)
+        res = self.decisions.get(key)
+        if res is None:
+            res = self.ref.free_actions.lookup(*key)
+            if res is not True:
+                own = self.permset.lookup(*key)
+                res = True if own is True else res + own
+            if len(self.decisions) >= self.permset.cache_size:
+                self.decisions.clear()
+            self.decisions[key] = res
+        return res
 
     def check_permission(self, action):
-        if hasattr(self.ref.conf, "FREE_ACTIONS"):
-            p1 = self._check_per(self.ref.conf.FREE_ACTIONS, action)
-            if p1:
-                return p1
-        p2 = self._check_per(self.perms, action)
-        if p2:
-            return p2
+        res = self._lookup(action)
+        if res is True:
+            return True
+        for rule in res:
+            if rule.match_params(action.data):
+                return True
 
         if self.user:
             if self.user.is_active is False:
@@ -2,13 +2,16 @@ import re
 import yaml
 import json
 import enum
-from datetime import datetime, date, time
+from datetime import datetime, date, time, timedelta, timezone
 from decimal import Decimal
 from sqlalchemy import inspect
 import inspect as ins
 from termcolor import colored
 from terminaltables import AsciiTable
 import msgpack
+from bee.core.expression import CustomCast, parse_url, console_to_url
+from bee.core.expression import URLExpression, ConsoleToURLExpression
+from bee.core.expression import get_option
 
 class ModuleLoader:
     def __init__(self, moddir, debug=False):
@@ -59,6 +62,8 @@ class ModuleLoader:
             return mod
 
 class Action:
+    dotchecker = re.compile(r'\.{2,}')
+
     def __init__(self, data):
         self.m = None
         self.c = None
@@ -67,7 +72,6 @@ class Action:
         self.sync = False
         self.static = False
         self.reload_module = False
-        self.dotchecker = re.compile(r'\.{2,}')
         self.ready = False
         self.parse(data)
     @classmethod
@@ -122,182 +126,220 @@ class Shortcuts:
             return self.shortcuts.get(f)
         return f
 
-class CustomCast:
-    '''
-        Usage: CustomCast.cast(str)
-        b+ bool
-        d+ Decimal
-        f+ float
-        dt+ datetime (d/m/Y H:M:S)
-        date+ date(d/m/Y)
-        i+ int
-    '''
-    aliases = {'b+': ['bool+'],
-               'd+': ['decimal+', 'dec+'],
-               'f+': ['float+'],
-               'dt+': ['datetime+'],
-               'date+': [],
-               'i+': ['int+'],
-               's+': ['str+']}
-
-    @classmethod
-    def clear(cls, value):
-        for k in cls.aliases.keys():
-            if value.startswith(k):
-                return value.split(k)[1].strip()
-        return value
-    @classmethod
-    def do(cls, value):
-        cmap = {'b+': bool, 'd+': Decimal, 'f+': float,
-                'dt+': lambda n: datetime.strptime(n, "%d/%m/%Y %H:%M:%S"),
-                'date+': lambda n: datetime.strptime(n, "%d/%m/%Y").date(),
-                'i+': int, 's+': str}
-
-        for k, v in cmap.items():
-            if k == 'b+':
-                continue
-            temp = "{} ".format(k)
-            if value.startswith(temp) or any([True if k.startswith("{} ".format(k)) else False for k in cls.aliases[temp.strip()]]):
-                try:
-                    value = v(value.split(temp)[1])
-                except Exception as e:
-                    raise e
-                else:
-                    return value
-        try:
-            if value in ["True", "true", "b+ true", "b+ True"]:
-                return True
-            if value in ["False", "false", "b+ false", "b+ False"]:
-                return False
-        except Exception as e:
-            raise e
-        return value
-
-    @classmethod
-    def cast(cls, value):
-        match = re.search(r"\[(\||,)(b\+|d\+|f\+|dt\+|date\+|i\+|s\+)\](.*)", value, re.MULTILINE | re.VERBOSE)
-        if match:
-            try:
-                sep = match.group(1)
-                itype = match.group(2)
-                val = match.group(3)
-                return [cls.do("{} {}".format(
-                    itype.strip(), t.strip())) for t in val.split(sep)]
-            except Exception as e:
-                print(Color.r(e))
-                return value
-        else:
-            return cls.do(value)
-
-class URLExpression:
+class Expression:
     def __init__(self, exp):
         self.parse(exp)
-    def parse(self, exp):
-        from urllib.parse import urlparse
-        try:
-            item = urlparse(exp)
-            path = item.path.split(".")
-            params = {}
-            for i in item.query.split("&"):
-                if "=" in i:
-                    k, v = i.split("=")
-                    v = CustomCast.cast(v)
-                    params.update({k: v})
-            self.data = {'data': params}
-            if path:
-                _f = path.pop(-1)
-                self.data.update({'_f': _f})
-            if path:
-                _c = path.pop(-1)
-                self.data.update({'_c': _c})
-            if path:
-                _m = str.join(".", path)
-                self.data.update({'_m': _m})
-        except Exception as e:
-            raise e
-    def __str__(self):
-        return str.join(", ", ["{}={}".format(k, v) for k, v in self.data.items()])
-
-class ConsoleToURLExpression:
-    def __init__(self, exp):
-        self.url = None
-        self.parse(exp)
 
     def parse(self, exp):
-        import shlex
-        try:
-            params = shlex.split(exp)
-            cmd = params.pop(0).replace("/", ".")
-            self.url = "{}?{}".format(cmd, str.join("&", params))
-        except Exception as e:
-            raise e
+        self.data = exp
 
-class JSONExpression:
-    def __init__(self, exp):
-        self.parse(exp)
+    def split(self):
+        # a batch (list) becomes one expression per item, without re-parsing
+        if isinstance(self.data, list):
+            return [Expression(t) for t in self.data]
+        return [self]
 
+class JSONExpression(Expression):
     def parse(self, exp):
         self.data = BJSON.decode(exp)
 
 
-class MsgPackExpression:
-    def __init__(self, exp):
-        self.parse(exp)
+class MsgPackExpression(Expression):
     def parse(self, exp):
-        self.data = msgpack.unpackb(exp, encoding="utf-8")
+        self.data = BMsgPack.decode(exp)
+
+def model_fields(klass):
+    rh = getattr(klass, "_repr_hide", None) or []
+    if hasattr(klass, "_columns"):
+        return [k for k in klass._columns.keys() if k not in rh]
+    fields = []
+    for c in klass.__table__.columns:
+        if hasattr(c, "info"):
+            if "sensitive" in c.info and c.info['sensitive']:
+                continue
+        if c.name not in rh:
+            fields.append(c.name)
+    return fields
+
+class Columnar:
+    '''
+        Opt-in columnar wire format for lists of same-model rows:
+            self.send(items=Columnar(rows))
+            -> {"items": {"cols": ["id", "name"], "rows": [[1, "a"], ...]}}
+        Works for json and msgpack. Clients rehydrate with:
+            rows.map(r => Object.fromEntries(cols.map((c, i) => [c, r[i]])))
+    '''
+    fields = {}
+
+    def __init__(self, items):
+        # generators and querysets are read once
+        if not isinstance(items, (list, tuple)):
+            items = list(items)
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def table(self):
+        if not self.items:
+            return {'cols': [], 'rows': []}
+        first = next(iter(self.items))
+        if isinstance(first, dict):
+            cols = list(first.keys())
+            return {'cols': cols,
+                    'rows': [[i.get(k) for k in cols] for i in self.items]}
+        klass = type(first)
+        cols = self.fields.get(klass)
+        if cols is None:
+            cols = self.fields[klass] = model_fields(klass)
+        return {'cols': cols,
+                'rows': [[getattr(i, k) for k in cols] for i in self.items]}
 
 class CustomJSONEncoder(json.JSONEncoder):
+    '''
+        Converters are looked up by type (then along the mro for subclasses)
+        and cached per type; rom/gino models get a cached list of visible
+        fields (_repr_hide and sensitive columns left out).
+    '''
+    converters = {
+        enum.Enum: lambda obj: "{}".format(obj.name),
+        complex: lambda obj: [obj.real, obj.imag],
+        datetime: lambda obj: obj.isoformat(),
+        date: lambda obj: obj.isoformat(),
+        set: list,
+        Decimal: float,
+        time: str,
+        Columnar: Columnar.table,
+    }
+    dispatch = {}
+
+    @classmethod
+    def resolve(cls, klass):
+        if hasattr(klass, "_columns") or hasattr(klass, "__table__"):
+            fields = model_fields(klass)
+            return lambda obj: {k: getattr(obj, k) for k in fields}
+        for k in klass.__mro__:
+            if k in cls.converters:
+                return cls.converters[k]
+        return None
+
     def default(self, obj):
-        if hasattr(obj, "_columns"):
-            columns = obj._columns
-            d = {}
-            rh = obj._repr_hide if hasattr(obj, "_repr_hide") else []
-            for k in columns.keys():
-                if k in rh:
-                    continue
-                d[k] = getattr(obj, k)
-            return d
-
-        if hasattr(obj, '__table__'):
-            columns = obj.__table__.columns
-            d = {}
-            for c in columns:
-                if hasattr(c, "info"):
-                    if "sensitive" in c.info and c.info['sensitive']:
-                        continue
-                fld = str(c).split('.')[1]
-                v = getattr(obj, fld)
-                d[fld] = v
-            return d
-        if isinstance(obj, enum.Enum):
-            return "{}".format(obj.name)
-        if isinstance(obj, complex):
-            return [obj.real, obj.imag]
-        if isinstance(obj, datetime) or isinstance(obj, date):
-            return obj.isoformat()
-        if isinstance(obj, set):
-            return list(obj)
-        if isinstance(obj, Decimal):
-            return float(obj)
-        if isinstance(obj, time):
-            return str(obj)
+        klass = type(obj)
+        try:
+            conv = self.dispatch[klass]
+        except KeyError:
+            conv = self.dispatch[klass] = self.resolve(klass)
+        if conv is not None:
+            return conv(obj)
         return json.JSONEncoder.default(self, obj)
 
+try:
+    import rapidjson
+except ImportError:
+    rapidjson = None
+
 class BJSON:
+    encoder = CustomJSONEncoder()
+    backend = "rapidjson" if rapidjson else "json"
+
+    @classmethod
+    def set_backend(cls, name):
+        if name == "rapidjson" and rapidjson is None:
+            raise ValueError("rapidjson isn't installed!")
+        cls.backend = name
+
     @classmethod
     def encode(cls, data):
         try:
-            return json.dumps(data, cls=CustomJSONEncoder)
+            if cls.backend == "rapidjson":
+                return rapidjson.dumps(
+                    data, default=cls.encoder.default,
+                    number_mode=rapidjson.NM_NAN,
+                    mapping_mode=rapidjson.MM_COERCE_KEYS_TO_STRINGS)
+            return cls.encoder.encode(data)
         except Exception as e:
             raise e
 
     @classmethod
     def decode(cls, data):
         try:
+            if cls.backend == "rapidjson":
+                return rapidjson.loads(data, number_mode=rapidjson.NM_NAN)
             return json.loads(data)
         except Exception as e:
             raise e
 
+class BMsgPack:
+    '''
+        Ext types:
+            1 datetime [y, m, d, H, M, S, us, utcoffset seconds or nil]
+            2 date [y, m, d]
+            3 Decimal str
+            4 enum [class name, member name]
+            5 time [H, M, S, us]
+        Enums decode to their member when the class is registered with
+        BMsgPack.register_enum, otherwise to the member name.
+    '''
+    encoder = CustomJSONEncoder()
+    enums = {}
+
+    @classmethod
+    def register_enum(cls, klass):
+        cls.enums[klass.__name__] = klass
+        return klass
+
+    @classmethod
+    def ext(cls, obj):
+        if isinstance(obj, datetime):
+            off = obj.utcoffset()
+            return msgpack.ExtType(1, msgpack.packb([
+                obj.year, obj.month, obj.day, obj.hour, obj.minute,
+                obj.second, obj.microsecond,
+                int(off.total_seconds()) if off is not None else None]))
+        if isinstance(obj, date):
+            return msgpack.ExtType(2, msgpack.packb(
+                [obj.year, obj.month, obj.day]))
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(3, str(obj).encode("utf-8"))
+        if isinstance(obj, enum.Enum):
+            return msgpack.ExtType(4, msgpack.packb(
+                [type(obj).__name__, obj.name], use_bin_type=True))
+        if isinstance(obj, time):
+            return msgpack.ExtType(5, msgpack.packb(
+                [obj.hour, obj.minute, obj.second, obj.microsecond]))
+        return cls.encoder.default(obj)
+
+    @classmethod
+    def ext_hook(cls, code, data):
+        if code == 1:
+            item = msgpack.unpackb(data)
+            tz = None
+            if item[7] is not None:
+                tz = timezone(timedelta(seconds=item[7]))
+            return datetime(*item[:7], tzinfo=tz)
+        if code == 2:
+            return date(*msgpack.unpackb(data))
+        if code == 3:
+            return Decimal(data.decode("utf-8"))
+        if code == 4:
+            name, member = msgpack.unpackb(data, raw=False)
+            if name in cls.enums:
+                return cls.enums[name][member]
+            return member
+        if code == 5:
+            return time(*msgpack.unpackb(data))
+        return msgpack.ExtType(code, data)
+
+    @classmethod
+    def encode(cls, data):
+        return msgpack.packb(data, default=cls.ext, use_bin_type=True)
+
+    @classmethod
+    def decode(cls, data):
+        # raw/strict_map_key behave the same on msgpack 0.6 and 1.x
+        return msgpack.unpackb(data, raw=False, strict_map_key=False,
+                               ext_hook=cls.ext_hook)
+
 class Inspect:
     def __init__(self, item):
         self.mapper = inspect(item)
@@ -1,4 +1,19 @@
 #!/usr/bin/env python
+"""
+    Usage: bee_load module.Model path.json[.gz] [options]
+        --copy           postgres only, load through COPY instead of INSERT
+        --rom            model is a rom (redis) model
+        --pipeline       rom only, save each batch through one redis pipeline
+        --transaction    rom only, like --pipeline but wrapped in MULTI/EXEC
+        --batch=N        rows per insert (default 1000)
+        --concurrency=N  batches in flight (default 4)
+        --offset=N       skip the first N rows
+        --resume         continue a stopped load from path.resume, which
+                         lists the batches already written
+
+    Files are either a json array or ndjson (one object per line), and are
+    read incrementally.
+"""
 
 import asyncio
 import sys
@@ -6,8 +21,13 @@ import uvloop
 import importlib
 import gzip
 import json
+import enum
+from decimal import Decimal
+from itertools import islice, chain
+from time import monotonic
 from bee.models import db
-from datetime import datetime
+from datetime import datetime, date, time
+import sqlalchemy as sa
 
 from colorama import init
 init(autoreset=True)
@@ -17,19 +37,431 @@ cpath = str(Path().absolute())
 if cpath not in sys.path:
     sys.path.append(cpath)
 
-from bee.core.utils import Color
+from bee.core.utils import Color, get_option
 import conf
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 loop = asyncio.get_event_loop()
 
-async def main():
+READ_SIZE = 1 << 16
+
+
+def open_data(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def invalid(count, offset, msg):
+    return ValueError("Invalid json at record {}, offset {}: {}".format(
+        count, offset, msg))
+
+
+def iter_array(f, buf):
+    decoder = json.JSONDecoder()
+    pos = 1
+    base = 0
+    count = 0
+    failed = None
+    # "," must separate items: expected after an item, a value after it
+    comma = False
+    while True:
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == "]" and (comma or not count):
+                check_end(f, buf[pos + 1:], base + pos + 1)
+                return
+            if comma:
+                if buf[pos] != ",":
+                    raise invalid(count, base + pos, "Expecting ',' delimiter")
+                comma = False
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError as e:
+                # the item may be cut by the end of the buffer, it is invalid
+                # if it fails at the same place once more data is read
+                error = (base + e.pos, e.msg)
+                if error == failed and \
+                        not e.msg.startswith("Unterminated string"):
+                    raise invalid(count, *error)
+                failed = error
+                break
+            # a number at the end of the buffer may still be incomplete
+            if end == len(buf) and not isinstance(item, (dict, list)):
+                break
+            failed = None
+            count += 1
+            yield item
+            pos = end
+            comma = True
+        chunk = f.read(READ_SIZE)
+        if not chunk:
+            if failed is not None and failed[0] < base + len(buf):
+                raise invalid(count, *failed)
+            raise ValueError("Unterminated json array at record {}".format(
+                count))
+        base += pos
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def check_end(f, rest, offset):
+    # only whitespace may follow the closing bracket
+    while True:
+        if rest and not rest.isspace():
+            raise ValueError("Unexpected data after the json array, "
+                             "offset {}".format(offset + len(rest) -
+                                                len(rest.lstrip())))
+        offset += len(rest)
+        rest = f.read(READ_SIZE)
+        if not rest:
+            return
+
+
+def iter_lines(lines, first=1):
+    for number, line in enumerate(lines, first):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError("Invalid json at line {}: {}".format(
+                    number, getattr(e, "msg", e)))
+
+
+def is_lines(buf):
+    # ndjson rows may be arrays too: the first value then ends the line
+    # and more values follow
+    line, sep, rest = buf.partition("\n")
+    if not sep or not rest.strip():
+        return False
+    try:
+        json.loads(line)
+    except ValueError:
+        return False
+    return True
+
+
+def iter_records(path):
+    with open_data(path) as f:
+        first = 1
+        while True:
+            chunk = f.read(1)
+            if chunk == "\n":
+                first += 1
+            if not chunk or not chunk.isspace():
+                break
+        buf = chunk + f.read(READ_SIZE)
+        if buf.startswith("[") and not is_lines(buf):
+            yield from iter_array(f, buf)
+        elif buf:
+            buf += f.readline()
+            yield from iter_lines(chain(buf.splitlines(), f), first)
+
+
+def iter_batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Progress:
+    '''
+        Batches complete out of order: rows are counted up to the first
+        batch that is not done yet, the ones done past it are kept in
+        `ahead` and saved with the resume state, so a resumed load skips
+        exactly the batches that were written.
+    '''
+    def __init__(self, offset=0, batch=1000):
+        self.start = monotonic()
+        self.offset = offset
+        self.batch = batch
+        self.rows = 0
+        self.rejected = 0
+        self.last = 0
+        self.next = 0
+        self.ahead = {}
+
+    def complete(self, idx, count):
+        self.ahead[idx] = count
+        while self.next in self.ahead:
+            self.update(self.ahead.pop(self.next))
+            self.next += 1
+
+    def update(self, count):
+        self.rows += count
+        now = monotonic()
+        if now - self.last >= 1:
+            self.last = now
+            self.show()
+
+    def show(self):
+        elapsed = monotonic() - self.start
+        rate = self.rows / elapsed if elapsed else 0
+        print(Color.g("{} rows, {:.0f} rows/sec".format(self.rows, rate)))
+
+    def state(self):
+        return {'offset': self.offset + self.rows,
+                'batch': self.batch,
+                'done': sorted(i - self.next for i in self.ahead)}
+
+
+def state_path(path):
+    return "{}.resume".format(path)
+
+
+def read_state(path):
+    with open(state_path(path)) as f:
+        return json.load(f)
+
+
+def save_state(path, progress):
+    with open(state_path(path), "w") as f:
+        json.dump(progress.state(), f)
+
+
+async def insert_batch(model, batch):
+    await model.insert().gino.all(*batch)
+    return len(batch)
+
+
+def parse_datetime(v):
+    if hasattr(datetime, "fromisoformat"):
+        return datetime.fromisoformat(v)
+    fmt = "%Y-%m-%dT%H:%M:%S.%f" if "." in v else "%Y-%m-%dT%H:%M:%S"
+    return datetime.strptime(v, fmt)
+
+
+def parse_date(v):
+    if "T" in v:
+        return parse_datetime(v).date()
+    return datetime.strptime(v, "%Y-%m-%d").date()
+
+
+def parse_time(v):
+    fmt = "%H:%M:%S.%f" if "." in v else "%H:%M:%S"
+    return datetime.strptime(v, fmt).time()
+
+
+def enum_label(v):
+    return v.name if isinstance(v, enum.Enum) else v
+
+
+def json_text(v):
+    return v if isinstance(v, str) else json.dumps(v)
+
+
+def caster(column):
+    # reverses what CustomJSONEncoder does to the value of this column
+    t = column.type
+    if isinstance(t, sa.DateTime):
+        return datetime, parse_datetime
+    if isinstance(t, sa.Date):
+        return date, parse_date
+    if isinstance(t, sa.Time):
+        return time, parse_time
+    if isinstance(t, sa.Enum):
+        return None, enum_label
+    if isinstance(t, sa.Numeric) and t.asdecimal:
+        return Decimal, lambda v: Decimal(str(v))
+    if isinstance(t, sa.JSON):
+        return None, json_text
+    return None, None
+
+
+class CopyPlan:
+    def __init__(self, model):
+        self.table = model.__table__
+        self.columns = []
+        for c in self.table.columns:
+            default = c.default
+            # sequences and sql expressions are left to the server
+            if default is not None and not (default.is_scalar or
+                                            default.is_callable):
+                default = None
+            self.columns.append((c, default) + caster(c))
+
+    def records(self, batch):
+        # columns missing from the whole batch are left to the server
+        # default, unless they have a python side one
+        keys = set()
+        for d in batch:
+            keys.update(d.keys())
+        cols = [i for i in self.columns
+                if i[0].key in keys or i[1] is not None]
+        records = []
+        for d in batch:
+            row = []
+            for c, default, kind, cast in cols:
+                if c.key in d:
+                    v = d[c.key]
+                elif default is None:
+                    v = None
+                elif default.is_callable:
+                    v = default.arg(None)
+                else:
+                    v = default.arg
+                if v is not None and cast is not None and \
+                        (kind is None or not isinstance(v, kind)):
+                    v = cast(v)
+                row.append(v)
+            records.append(tuple(row))
+        return [c[0].name for c in cols], records
+
+
+async def copy_batch(plan, batch):
+    columns, records = plan.records(batch)
+    async with db.acquire() as conn:
+        raw = await conn.get_raw_connection()
+        await raw.copy_records_to_table(
+            plan.table.name, records=records, columns=columns,
+            schema_name=plan.table.schema)
+    return len(batch)
+
+
+async def load_sql(model, batches, progress, concurrency, plan=None,
+                   skip=()):
+    pending = set()
+    try:
+        for idx, batch in enumerate(batches):
+            if idx in skip:
+                progress.complete(idx, len(batch))
+                continue
+            if len(pending) >= concurrency:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                report(done, progress)
+            if plan:
+                task = loop.create_task(copy_batch(plan, batch))
+            else:
+                task = loop.create_task(insert_batch(model, batch))
+            task.idx = idx
+            pending.add(task)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_EXCEPTION)
+            report(done, progress)
+    except BaseException:
+        for t in pending:
+            t.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+
+
+def report(done, progress):
+    # every finished batch is counted before the first error is raised
+    error = None
+    for t in done:
+        if t.exception() is None:
+            progress.complete(t.idx, t.result())
+        elif error is None:
+            error = t.exception()
+    if error is not None:
+        raise error
+
+
+def save_rom(model, batch):
+    for d in batch:
+        item = model(**d)
+        item.save()
+
+
+def writer_error(replies):
+    # rom's writer script reports unique index collisions as a json reply
+    # ({"unique": column}), Model.save turns it into UniqueKeyViolation
+    for reply in replies:
+        if isinstance(reply, (bytes, str)):
+            try:
+                res = json.loads(reply)
+            except ValueError:
+                continue
+            if isinstance(res, dict) and res:
+                return res
+    return None
+
+
+def save_rom_pipelined(model, batch, transaction=False):
+    # Same steps as rom's Model.save, but the index writer script is queued
+    # on a pipeline. Rows rejected by a unique index are not written and
+    # returned as (row, error) pairs.
+    # Uses rom internals, keep in line with the rom pin in setup.py.
+    from rom import session
+    pipe = model._connection.pipeline(transaction)
+    items = []
+    for d in batch:
+        item = model(**d)
+        was_new = item._new
+        if was_new:
+            item._before_insert()
+        else:
+            item._before_update()
+        first = len(pipe.command_stack)
+        _, data = model._apply_changes(
+            item._last, item.to_dict(), True, is_new=was_new, _conn=pipe)
+        items.append((d, item, data, was_new,
+                      (first, len(pipe.command_stack))))
+    results = pipe.execute()
+    rejected = []
+    for d, item, data, was_new, (first, last) in items:
+        error = writer_error(results[first:last])
+        if error is not None:
+            rejected.append((d, error))
+            session.forget(item)
+            continue
+        item._last = data
+        item._new = False
+        item._modified = False
+        item._deleted = False
+        if was_new:
+            item._after_insert()
+        else:
+            item._after_update()
+        session.forget(item)
+    return rejected
+
+
+def load_rom(model, batches, progress, pipeline=False, transaction=False,
+             skip=()):
+    for idx, batch in enumerate(batches):
+        if idx in skip:
+            progress.complete(idx, len(batch))
+            continue
+        start = monotonic()
+        if pipeline or transaction:
+            rejected = save_rom_pipelined(model, batch,
+                                          transaction=transaction)
+            print(Color.b("batch: {} rows, {:.1f} ms".format(
+                len(batch) - len(rejected), (monotonic() - start) * 1000)))
+            for d, error in rejected:
+                print(Color.r("rejected {}: {}".format(error, d)))
+            progress.rejected += len(rejected)
+        else:
+            save_rom(model, batch)
+        progress.complete(idx, len(batch))
+
+
+async def load():
     if len(sys.argv) < 3:
         print(Color.r("Missing required parameters! (Define model and json file path)"))
+        print(__doc__)
         return
     name = sys.argv[1]
     path = sys.argv[2]
     is_rom = True if "--rom" in str.join(" ", sys.argv) else False
+    pipeline = "--pipeline" in sys.argv
+    transaction = "--transaction" in sys.argv
+    copy = "--copy" in sys.argv
+    batch_size = get_option("batch", 1000)
+    concurrency = get_option("concurrency", 4)
+    offset = get_option("offset", 0)
+    skip = ()
     model = None
 
     try:
@@ -43,39 +475,67 @@ async def main():
         print(Color.r(e))
         return
 
+    if not Path(path).exists():
+        print(Color.r("Unable to load data or model"))
+        return
+
+    if "--resume" in sys.argv:
+        try:
+            state = read_state(path)
+        except Exception as e:
+            print(Color.r("Unable to read {} ({})".format(state_path(path), e)))
+            return
+        offset, batch_size = state['offset'], state['batch']
+        skip = set(state['done'])
+
+    records = islice(iter_records(path), offset, None)
+    batches = iter_batches(records, batch_size)
+    progress = Progress(offset, batch_size)
+    start = datetime.now()
+    print(Color.y("Started: {}".format(start)))
     try:
-        if path.endswith(".gz"):
-            with gzip.open(path) as f:
-                data = json.load(f)
+        if is_rom:
+            load_rom(model, batches, progress, pipeline=pipeline,
+                     transaction=transaction, skip=skip)
         else:
-            with open(path) as f:
-                data = json.load(f)
+            await db.set_bind(conf.SA_CONNECTION_STR,
+                              min_size=1, max_size=concurrency)
+            plan = None
+            if copy:
+                if db.bind.dialect.name == "postgresql":
+                    plan = CopyPlan(model)
+                else:
+                    print(Color.y("--copy needs postgres, using INSERT"))
+            await load_sql(model, batches, progress, concurrency, plan=plan,
+                           skip=skip)
     except Exception as e:
         print(Color.r(e))
+        save_state(path, progress)
+        print(Color.r("Stopped, resume with --resume ({})".format(
+            state_path(path))))
         return
 
-    if data and model:
-        start = datetime.now()
-        engine = await db.set_bind(conf.SA_CONNECTION_STR)
-        print(Color.y("Started: {}".format(start)))
-        if is_rom:
-            for d in data:
-                item = model(**d)
-                item.save()
-        else:
-            await model.insert().gino.all(*data)
+    if Path(state_path(path)).exists():
+        Path(state_path(path)).unlink()
 
-        end = datetime.now()
-        print(Color.y("Ended: {}, Duration: {}".format(end, end - start)))
-    else:
-        print(Color.r("Unable to load data or model"))
+    progress.show()
+    end = datetime.now()
+    print(Color.y("Ended: {}, Duration: {}, Rows: {}".format(
+        end, end - start, progress.rows - progress.rejected)))
+    if progress.rejected:
+        print(Color.r("{} rows rejected by unique indexes".format(
+            progress.rejected)))
     return True
 
 
+def main():
+    try:
+        loop.run_until_complete(load())
+    except Exception as e:
+        print(e)
+    finally:
+        loop.close()
+
 
-try:
-    loop.run_until_complete(main())
-except Exception as e:
-    print(e)
-finally:
-    loop.close()
+if __name__ == "__main__":
+    main()
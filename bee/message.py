@@ -1,25 +1,94 @@
 #!/usr/bin/env python
-import redis
+"""
+    Usage: bee_msg channel key=value ...
+           bee_msg --stdin [--batch=N] < commands
+        --stdin    read one command (channel key=value ...) per line and
+                   publish them through one pipelined connection
+        --batch=N  commands per pipeline (default 500)
+"""
 import sys
-from six import moves
-from bee.core.utils import URLExpression, ConsoleToURLExpression, BJSON
+import json
+from time import monotonic
+import redis
+from bee.core.expression import URLExpression, ConsoleToURLExpression
+from bee.core.expression import get_option
 
 from pathlib import Path
 cpath = str(Path().absolute())
 if cpath not in sys.path:
     sys.path.append(cpath)
 
+import conf
 from conf import REDIS_HOST, REDIS_PORT, REDIS_MPATTERN
 
 q = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT)
+streams = set(getattr(conf, "STREAM_CHANNELS", []))
+
+
+def encode(data):
+    try:
+        return json.dumps(data, separators=(",", ":"))
+    except TypeError:
+        # Decimal, datetime... values need the full encoder
+        from bee.core.utils import BJSON
+        return BJSON.encode(data)
+
+
+def parse(cmd):
+    ue = URLExpression(ConsoleToURLExpression(cmd).url)
+    if "_f" in ue.data and len(ue.data['data'].keys()) > 0:
+        return ue.data['_f'], encode(ue.data['data'])
+    return None
+
+
+def send(conn, channel, payload):
+    cname = "{}-{}".format(REDIS_MPATTERN, channel)
+    if channel in streams:
+        conn.xadd(cname, {'data': payload},
+                  maxlen=getattr(conf, "STREAM_MAXLEN", 100000))
+    else:
+        conn.publish(cname, payload)
+
+
+def batch(size):
+    pipe = q.pipeline(transaction=False)
+    start = monotonic()
+    sent = pending = skipped = 0
+    for line in sys.stdin:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            msg = parse(line)
+        except Exception as e:
+            print("{}: {}".format(line, e), file=sys.stderr)
+            msg = None
+        if msg is None:
+            skipped += 1
+            continue
+        send(pipe, *msg)
+        pending += 1
+        if pending >= size:
+            pipe.execute()
+            sent += pending
+            pending = 0
+    if pending:
+        pipe.execute()
+        sent += pending
+    elapsed = monotonic() - start
+    print("{} messages ({} skipped) in {:.3f}s, {:.0f} msg/s".format(
+        sent, skipped, elapsed, sent / elapsed if elapsed else 0),
+        file=sys.stderr)
+
 
 def main():
-    if len(sys.argv) > 1:
-        cmd = str.join(" ", sys.argv[1:])
-        ue = URLExpression(ConsoleToURLExpression(cmd).url)
-        if "_f" in ue.data and len(ue.data['data'].keys()) > 0:
-            try:
-                q.publish("{}-{}".format(REDIS_MPATTERN, ue.data['_f']),
-                          BJSON.encode(ue.data['data']))
-            except Exception as e:
-                raise e
+    if "--stdin" in sys.argv:
+        batch(get_option("batch", 500))
+    elif len(sys.argv) > 1:
+        msg = parse(str.join(" ", sys.argv[1:]))
+        if msg is not None:
+            send(q, *msg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+"""
+    Usage: bee_workers app_type module:serve [options]
+        --workers=N   worker processes (default: cpu count)
+        --host=H      listen address (default 0.0.0.0)
+        --port=N      listen port (default 8080)
+        --grace=N     seconds to wait for workers on shutdown (default 30)
+        --shortcuts=P shortcuts file (default apps/<app_type>/shortcuts.yaml)
+
+    Forks N workers, each with its own loop and App, all listening on the
+    same port through SO_REUSEPORT. `serve` is a coroutine function of the
+    project, called in every worker as serve(app, sock) to start its
+    server on the given socket, e.g. for aiohttp:
+        async def serve(app, sock):
+            runner = web.AppRunner(make_web_app(app))
+            await runner.setup()
+            await web.SockSite(runner, sock).start()
+            return runner
+    The returned server (if any) and the socket are closed first on
+    shutdown. Services (App.start_services) only run on worker 0. Crashed
+    workers are restarted, SIGTERM/SIGINT drain every worker through
+    App.a_exit. conf.NODE_ID (default <hostname>-<supervisor pid>) and
+    conf.STREAM_CONSUMER get the worker index as suffix, so every worker
+    has its own presence channel and stream consumer.
+"""
+
+import asyncio
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+import uvloop
+
+from colorama import init
+init(autoreset=True)
+
+from .apps.app import App
+from .core.utils import Color, get_option
+
+import conf
+
+
+def load_serve(path):
+    module, _, func = path.partition(":")
+    return getattr(importlib.import_module(module), func or "serve")
+
+
+def make_socket(host, port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.setblocking(False)
+    return sock
+
+
+def worker_names(index):
+    # without a configured NODE_ID the supervisor pid keeps the ids of two
+    # supervisors on one host apart, a restarted worker keeps its id
+    node = getattr(conf, "NODE_ID", None) or "{}-{}".format(
+        socket.gethostname(), os.getppid())
+    conf.NODE_ID = "{}-{}".format(node, index)
+    if getattr(conf, "STREAM_CONSUMER", None):
+        conf.STREAM_CONSUMER = "{}-{}".format(conf.STREAM_CONSUMER, index)
+
+
+def run_worker(index, app_type, serve, host, port, spath=None):
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    worker_names(index)
+    app = App(app_type=app_type, spath=spath)
+    app.set_loop(loop)
+    app.start_services(services=index == 0)
+    app.set_init_params(sys.argv)
+    stopping = []
+
+    def stop():
+        if not stopping:
+            stopping.append(True)
+            loop.create_task(app.a_exit())
+
+    loop.add_signal_handler(signal.SIGTERM, stop)
+    loop.add_signal_handler(signal.SIGINT, stop)
+    try:
+        sock = make_socket(host, port)
+        server = loop.run_until_complete(serve(app, sock))
+        app.listeners = [server, sock] if server is not None else [sock]
+        print(Color.g("- Worker {} ({}) listening on {}:{} -".format(
+            index, os.getpid(), host, port)))
+        loop.run_forever()
+    finally:
+        loop.close()
+
+
+class Supervisor:
+    '''
+        Keeps `size` forked workers alive. A worker that exits on its own
+        is restarted with the same index, at most once per second.
+    '''
+    def __init__(self, app_type, serve, host, port, size, grace=30,
+                 spath=None):
+        self.app_type = app_type
+        self.spath = spath
+        self.serve = serve
+        self.host = host
+        self.port = port
+        self.size = size
+        self.grace = grace
+        self.workers = {}
+        self.started = {}
+        self.stopping = False
+
+    def spawn(self, index):
+        last = self.started.get(index)
+        if last is not None and time.monotonic() - last < 1:
+            time.sleep(1)
+        self.started[index] = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                run_worker(index, self.app_type, self.serve,
+                           self.host, self.port, spath=self.spath)
+            except Exception as e:
+                print(Color.r(e))
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = index
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def kill(self):
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for i in range(self.size):
+            self.spawn(i)
+        deadline = None
+        while self.workers:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + self.grace
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if deadline is not None and time.monotonic() > deadline:
+                    self.kill()
+                    deadline = time.monotonic() + self.grace
+                time.sleep(0.1)
+                continue
+            index = self.workers.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            print(Color.r("Worker {} ({}) exited with {}, restarting".format(
+                index, pid, status)))
+            self.spawn(index)
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) < 2:
+        print(__doc__)
+        return
+    spath = get_option("shortcuts", "")
+    if not spath:
+        spath = "apps/{}/shortcuts.yaml".format(args[0])
+        spath = spath if os.path.exists(spath) else None
+    Supervisor(args[0], load_serve(args[1]),
+               host=get_option("host", "0.0.0.0"),
+               port=get_option("port", 8080),
+               size=get_option("workers", os.cpu_count() or 1),
+               grace=get_option("grace", 30),
+               spath=spath).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,8 +11,8 @@ kw = {
                          'SQLAlchemy>=1.3.0', 'redis',
                          'aioredis', 'six', 'gino==1.0.1',
                          'colorama', 'terminaltables',
-                         'termcolor', 'rom', 'cerberus',
-                         'click', 'msgpack'
+                         'termcolor', 'rom>=1.0,<1.2', 'cerberus',
+                         'click', 'msgpack>=0.6.1'
                          ],
     'packages': find_packages(),
     'zip_safe': False,
@@ -21,6 +21,7 @@ kw = {
             'bee_console=bee.console:main',
             'bee_msg=bee.message:main',
             'bee_load=bee.load:main',
+            'bee_workers=bee.workers:main',
         ]
     }
 }
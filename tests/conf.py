@@ -0,0 +1,7 @@
+# project settings used by the tests
+REDIS_HOST = "127.0.0.1"
+REDIS_PORT = 6379
+REDIS_MPATTERN = "bee"
+APP_DEBUG = False
+APP_MODELS = []
+SA_CONNECTION_STR = "postgresql://localhost/bee"
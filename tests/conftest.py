@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import pytest
+from bee.core.scheduler import ActionScheduler
+from bee.core.stats import Stats
+
+
+class Client:
+    # a websocket connection, keeps the frames sent to it
+    def __init__(self):
+        self.frames = []
+
+    def sendMessage(self, msg, binary=False):
+        self.frames.append((msg, binary))
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def app(loop):
+    '''
+        A ws App without redis, db or services. bee.apps.app needs
+        aioredis and an interpreter that still accepts asyncio.async.
+    '''
+    try:
+        from bee.apps.app import App
+    except (ImportError, SyntaxError) as e:
+        pytest.skip("bee.apps.app can't be imported: {}".format(e))
+    app = App.__new__(App)
+    app.app_type = "ws"
+    app.loop = loop
+    app.thread = threading.get_ident()
+    app.users = {}
+    app.uids = {}
+    app.clients = set()
+    app.binary_clients = set()
+    app.topics = {}
+    app.memberships = {}
+    app.bchunk = 2
+    app.presence = None
+    app.stats = Stats()
+    app.scheduler = ActionScheduler(app)
+    app.published = []
+    app.publish = lambda channel, **kw: app.published.append((channel, kw))
+    return app
+
+
+@pytest.fixture
+def connect(app):
+    def connect():
+        client = Client()
+        app.add_client(client)
+        return client
+    return connect
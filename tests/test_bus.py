@@ -0,0 +1,54 @@
+import asyncio
+from bee.core.bus import MemoryBus
+
+
+def test_pattern_delivery():
+    bus = MemoryBus()
+    every = bus.psubscribe("bee-*")
+    orders = bus.psubscribe("bee-orders")
+    params = {'id': 1}
+    assert bus.publish("bee-orders", params) == 2
+    assert bus.publish("bee-users", {}) == 1
+    assert bus.publish("other", {}) == 0
+    cname, received = orders.get_nowait()
+    assert cname == "bee-orders"
+    # params are passed as is, without serialization
+    assert received is params
+    assert orders.empty()
+    assert every.qsize() == 2
+    assert bus.stats()['published'] == 3
+
+
+def test_unsubscribe():
+    bus = MemoryBus()
+    q = bus.psubscribe("bee-*")
+    bus.publish("bee-a", {})
+    bus.unsubscribe(q)
+    assert bus.publish("bee-a", {}) == 0
+    assert q.qsize() == 1
+    assert bus.stats()['subscribers'] == 0
+
+
+def test_full_queues_drop():
+    bus = MemoryBus(maxsize=2)
+    q = bus.psubscribe("*")
+    for i in range(3):
+        bus.publish("c", i)
+    assert q.qsize() == 2
+    assert bus.stats()['dropped'] == 1
+
+
+def test_subscriber_wakes_up():
+    loop = asyncio.new_event_loop()
+    bus = MemoryBus()
+
+    async def main():
+        q = bus.psubscribe("bee-*")
+        reader = loop.create_task(q.get())
+        await asyncio.sleep(0)
+        bus.publish("bee-x", {'a': 1})
+        return await reader
+    try:
+        assert loop.run_until_complete(main()) == ("bee-x", {'a': 1})
+    finally:
+        loop.close()
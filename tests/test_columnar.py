@@ -0,0 +1,57 @@
+import json
+import sqlalchemy as sa
+from bee.core.utils import Columnar, BJSON, BMsgPack
+
+
+class Row:
+    _columns = {'id': None, 'name': None, 'secret': None}
+    _repr_hide = ["secret"]
+
+    def __init__(self, i):
+        self.id = i
+        self.name = "n{}".format(i)
+        self.secret = "s"
+
+
+class Item:
+    __table__ = sa.Table(
+        "items", sa.MetaData(), sa.Column("id", sa.Integer),
+        sa.Column("token", sa.String, info={'sensitive': True}))
+
+    def __init__(self, i):
+        self.id = i
+        self.token = "t"
+
+
+def test_dict_rows():
+    table = Columnar([{'a': 1, 'b': 2}, {'a': 3}]).table()
+    assert table == {'cols': ["a", "b"], 'rows': [[1, 2], [3, None]]}
+
+
+def test_empty():
+    assert Columnar([]).table() == {'cols': [], 'rows': []}
+    assert len(Columnar(iter([]))) == 0
+
+
+def test_model_rows_hide_fields():
+    assert Columnar([Row(1), Row(2)]).table() == {
+        'cols': ["id", "name"], 'rows': [[1, "n1"], [2, "n2"]]}
+    assert Columnar([Item(1)]).table() == {'cols': ["id"], 'rows': [[1]]}
+
+
+def test_fields_are_cached_per_type():
+    Columnar([Row(1)]).table()
+    assert Columnar.fields[Row] == ["id", "name"]
+
+
+def test_generators():
+    rows = Columnar(Row(i) for i in range(3))
+    assert len(rows) == 3
+    assert rows.table()['rows'] == [[0, "n0"], [1, "n1"], [2, "n2"]]
+
+
+def test_encoders():
+    data = {'items': Columnar([{'a': 1}])}
+    expected = {'items': {'cols': ["a"], 'rows': [[1]]}}
+    assert json.loads(BJSON.encode(data)) == expected
+    assert BMsgPack.decode(BMsgPack.encode(data)) == expected
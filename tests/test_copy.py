@@ -0,0 +1,44 @@
+import itertools
+from datetime import datetime
+from decimal import Decimal
+import pytest
+import sqlalchemy as sa
+
+pytest.importorskip("uvloop")
+pytest.importorskip("gino")
+load = pytest.importorskip("bee.load")
+
+
+def model():
+    seq = itertools.count()
+    table = sa.Table(
+        "items", sa.MetaData(),
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("qty", sa.Integer, default=1),
+        sa.Column("code", sa.Integer, default=lambda: next(seq)),
+        sa.Column("price", sa.Numeric(10, 2)),
+        sa.Column("created", sa.DateTime, server_default=sa.func.now()),
+        sa.Column("meta", sa.JSON))
+
+    class Item:
+        __table__ = table
+    return Item
+
+
+def test_copy_records_defaults():
+    plan = load.CopyPlan(model())
+    columns, rows = plan.records([{'id': 1}, {'id': 2, 'qty': 5}])
+    assert columns == ["id", "qty", "code"]
+    assert rows == [(1, 1, 0), (2, 5, 1)]
+
+
+def test_copy_records_casts():
+    plan = load.CopyPlan(model())
+    columns, rows = plan.records([
+        {'id': 1, 'price': 1.5, 'created': "2020-01-02T03:04:05",
+         'meta': {'a': 1}},
+        {'id': 2, 'price': None, 'created': None, 'meta': "{}"}])
+    assert columns == ["id", "qty", "code", "price", "created", "meta"]
+    assert rows[0][3:] == (Decimal("1.5"), datetime(2020, 1, 2, 3, 4, 5),
+                           '{"a": 1}')
+    assert rows[1][3:] == (None, None, "{}")
@@ -0,0 +1,77 @@
+import sys
+import pytest
+from bee.core.dispatch import ActionRegistry
+from bee.core.utils import Action
+
+SHOP = '''
+VERSION = {}
+
+
+class Cart:
+    async def add(self, **kw):
+        return VERSION
+
+    def total_sc(self, **kw):
+        pass
+'''
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    actions = tmp_path / "apps" / "web" / "actions"
+    actions.mkdir(parents=True)
+    for d in (tmp_path / "apps", tmp_path / "apps" / "web", actions):
+        (d / "__init__.py").write_text("")
+    (actions / "shop.py").write_text(SHOP.format(1))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield actions
+    for name in [n for n in sys.modules if n.split(".")[0] == "apps"]:
+        sys.modules.pop(name)
+
+
+def action(f, reload=False):
+    data = {'_m': "shop", '_c': "Cart", '_f': f, 'data': {}}
+    if reload:
+        data['data']['_reload'] = 1
+    return Action(data)
+
+
+def test_resolve_is_cached(project):
+    registry = ActionRegistry()
+    mod, desc = registry.resolve("web", action("add"))
+    assert desc.exists and desc.is_coroutine
+    assert desc.klass is mod.Cart
+    assert registry.resolve("web", action("add"))[1] is desc
+    assert list(registry.actions) == [("web", "shop", "Cart", "add")]
+
+
+def test_missing_actions_are_not_cached(project):
+    registry = ActionRegistry()
+    for i in range(10):
+        mod, desc = registry.resolve("web", action("nope{}".format(i)))
+        assert mod is not None and not desc.exists
+    assert registry.actions == {}
+
+
+def test_missing_module_and_class(project):
+    registry = ActionRegistry()
+    assert registry.resolve("web", Action(
+        {'_m': "nope", '_c': "Cart", '_f': "add", 'data': {}})) == \
+        (None, None)
+    with pytest.raises(AttributeError):
+        registry.resolve("web", Action(
+            {'_m': "shop", '_c': "Nope", '_f': "add", 'data': {}}))
+
+
+def test_reload(project):
+    registry = ActionRegistry()
+    mod, desc = registry.resolve("web", action("add"))
+    assert mod.VERSION == 1
+    # a different size, so a .pyc written in the same second is not reused
+    (project / "shop.py").write_text(SHOP.format(22))
+    mod, reloaded = registry.resolve("web", action("add", reload=True))
+    assert mod.VERSION == 22
+    assert reloaded is not desc
+    assert registry.resolve("web", action("add"))[1] is reloaded
+    registry.reload()
+    assert registry.actions == {}
@@ -0,0 +1,26 @@
+import pytest
+from bee.core.utils import (Expression, JSONExpression, MsgPackExpression,
+                            BMsgPack)
+
+
+def test_split_single_action():
+    e = JSONExpression('{"_f": "f", "data": {}}')
+    assert e.split() == [e]
+
+
+def test_split_batch():
+    items = JSONExpression('[{"_f": "a"}, {"_f": "b"}]').split()
+    assert [i.data['_f'] for i in items] == ["a", "b"]
+    assert all(isinstance(i, Expression) for i in items)
+
+
+def test_split_msgpack_batch():
+    raw = BMsgPack.encode([{'_f': "a"}, {'_f': "b"}])
+    assert len(MsgPackExpression(raw).split()) == 2
+
+
+@pytest.mark.parametrize("frame", ['5', '"x"', 'null', 'true'])
+def test_split_scalar_frames(frame):
+    items = JSONExpression(frame).split()
+    assert len(items) == 1
+    assert not isinstance(items[0].data, dict)
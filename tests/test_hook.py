@@ -0,0 +1,121 @@
+import asyncio
+import random
+from bee.core.hook import Hook, HookDispatcher, HookRegistry
+from bee.core.stats import Stats
+
+
+class App:
+    def __init__(self, loop, legacy=None):
+        self.loop = loop
+        self.stats = Stats()
+        self.legacy = legacy
+
+    def legacy_hook(self):
+        return self.legacy
+
+
+def run(main):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main(loop))
+    finally:
+        loop.close()
+
+
+async def idle(dispatcher):
+    while dispatcher.busy():
+        await asyncio.sleep(0.001)
+
+
+def test_registry_match():
+    registry = HookRegistry()
+
+    @registry.register("orm*")
+    class A(Hook):
+        pass
+
+    @registry.register("orm", ordered=True)
+    class B(Hook):
+        pass
+    assert registry.match("orm") == [(A, False), (B, True)]
+    assert registry.match("orm-users") == [(A, False)]
+    assert registry.match("chat") == []
+
+
+def test_ordered_hooks_keep_the_order():
+    registry = HookRegistry()
+    seen = []
+
+    @registry.register("orders", ordered=True)
+    class Ordered(Hook):
+        async def process(self):
+            await asyncio.sleep(random.random() / 1000)
+            seen.append(self.params)
+
+    async def main(loop):
+        dispatcher = HookDispatcher(App(loop), registry=registry, workers=4)
+        for n in range(20):
+            await dispatcher.dispatch("orders", n)
+        await idle(dispatcher)
+        dispatcher.stop()
+        return seen
+    assert run(main) == list(range(20))
+
+
+def test_ack_after_every_handler_succeeded():
+    registry = HookRegistry()
+
+    @registry.register("*")
+    class Ok(Hook):
+        async def process(self):
+            await asyncio.sleep(0.001)
+
+    @registry.register("fail*")
+    class Fail(Hook):
+        async def process(self):
+            raise ValueError("no")
+
+    async def main(loop):
+        dispatcher = HookDispatcher(App(loop), registry=registry, workers=2)
+        acks = []
+        await dispatcher.dispatch("good", {}, ack=lambda: acks.append("good"))
+        await dispatcher.dispatch("failing", {},
+                                  ack=lambda: acks.append("failing"))
+        await idle(dispatcher)
+        dispatcher.stop()
+        return acks, dispatcher.stats()
+    acks, stats = run(main)
+    assert acks == ["good"]
+    assert stats['errors'] == 1
+
+
+def test_unhandled_messages_are_acked():
+    async def main(loop):
+        dispatcher = HookDispatcher(App(loop), registry=HookRegistry())
+        acks = []
+        await dispatcher.dispatch("nobody", {}, ack=lambda: acks.append(1))
+        dispatcher.stop()
+        return acks
+    assert run(main) == [1]
+
+
+def test_legacy_hook_and_stats_keys():
+    seen = []
+
+    async def ws_message(app, cname, params):
+        seen.append((cname, params))
+
+    async def main(loop):
+        app = App(loop, legacy=ws_message)
+        dispatcher = HookDispatcher(app, registry=HookRegistry())
+        for i in range(3):
+            await dispatcher.dispatch("chan{}".format(i), {'i': i})
+        await idle(dispatcher)
+        dispatcher.stop()
+        return app.stats.report()
+    report = run(main)
+    assert sorted(seen, key=str) == [("chan{}".format(i), {'i': i})
+                                     for i in range(3)]
+    # one stats entry per handler, whatever the channel
+    assert list(report) == ["ws_message"]
+    assert report["ws_message"]["hook"]['count'] == 3
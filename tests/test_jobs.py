@@ -0,0 +1,80 @@
+import asyncio
+from bee.core.jobs import JobScheduler, every, on
+from bee.core.tasks import TaskGroup
+
+
+class Worker:
+    def __init__(self, loop):
+        self.loop = loop
+        self.tasks = TaskGroup(loop)
+        self.starts = []
+
+    @every(0.05, delay=0.01)
+    async def tick(self):
+        self.starts.append(self.loop.time())
+
+    @on("orders", concurrency=2)
+    async def order(self, params):
+        pass
+
+
+class Slow(Worker):
+    @every(0.02)
+    async def tick(self):
+        await asyncio.sleep(0.05)
+
+
+def run(klass, seconds):
+    loop = asyncio.new_event_loop()
+    worker = klass(loop)
+    scheduler = JobScheduler(worker, "bee")
+
+    async def main():
+        start = loop.time()
+        # no redis: the @on listener waits for it
+        worker.redis = None
+        scheduler.start()
+        await asyncio.sleep(seconds)
+        scheduler.stop()
+        await worker.tasks.stop()
+        await asyncio.sleep(0)
+        return start
+    try:
+        start = loop.run_until_complete(main())
+    finally:
+        loop.close()
+    return worker, scheduler, start
+
+
+def test_collect():
+    loop = asyncio.new_event_loop()
+    try:
+        jobs = {j.name: j for j in JobScheduler.collect(Worker(loop))}
+    finally:
+        loop.close()
+    assert jobs['tick'].kind == "every" and jobs['tick'].interval == 0.05
+    assert jobs['order'].kind == "on" and jobs['order'].channel == "orders"
+    assert jobs['order'].concurrency == 2
+
+
+def test_runs_follow_the_slots():
+    worker, scheduler, start = run(Worker, 0.23)
+    offsets = [t - start for t in worker.starts]
+    assert len(offsets) == 5
+    for n, offset in enumerate(offsets):
+        # due at delay + n * interval, never drifting with the run count
+        assert abs(offset - (0.01 + n * 0.05)) < 0.02
+    assert scheduler.stats()['tick']['runs'] == 5
+
+
+def test_busy_slots_are_skipped():
+    worker, scheduler, _ = run(Slow, 0.19)
+    stats = scheduler.stats()['tick']
+    assert stats['runs'] in (3, 4)
+    assert stats['skipped'] >= 4
+
+
+def test_stop_cancels_running_jobs():
+    worker, scheduler, _ = run(Slow, 0.03)
+    assert scheduler.runs == set()
+    assert scheduler.stats()['tick']['running'] == 0
@@ -0,0 +1,80 @@
+import gzip
+import json
+import pytest
+
+pytest.importorskip("uvloop")
+pytest.importorskip("gino")
+load = pytest.importorskip("bee.load")
+
+
+def records(tmp_path, text, name="data.json"):
+    path = tmp_path / name
+    if name.endswith(".gz"):
+        with gzip.open(str(path), "wt") as f:
+            f.write(text)
+    else:
+        path.write_text(text)
+    return list(load.iter_records(str(path)))
+
+
+@pytest.fixture
+def small_reads(monkeypatch):
+    monkeypatch.setattr(load, "READ_SIZE", 4)
+
+
+def test_array(tmp_path, small_reads):
+    items = [{'a': i, 's': "x" * i} for i in range(20)] + [12345, "str"]
+    assert records(tmp_path, "  " + json.dumps(items)) == items
+
+
+def test_ndjson_and_gzip(tmp_path):
+    text = '{"a": 1}\n\n{"a": 2}\n'
+    assert records(tmp_path, text) == [{'a': 1}, {'a': 2}]
+    assert records(tmp_path, text, "data.json.gz") == [{'a': 1}, {'a': 2}]
+
+
+def test_empty(tmp_path):
+    assert records(tmp_path, "") == []
+    assert records(tmp_path, "[]") == []
+
+
+def test_invalid_array_item(tmp_path, small_reads):
+    with pytest.raises(ValueError, match="record 1, offset 17"):
+        records(tmp_path, '[{"a": 1}, {"a": x}, {"a": 3}]')
+
+
+def test_unterminated_array(tmp_path, small_reads):
+    with pytest.raises(ValueError, match="Unterminated json array"):
+        records(tmp_path, '[{"a": 1}, {"a": 2}')
+    with pytest.raises(ValueError, match="Unterminated json array"):
+        records(tmp_path, '[1, 2')
+
+
+@pytest.mark.parametrize("text", ["[1 2]", "[1,,2]", "[1,]", "[1,2]x",
+                                  "[1,2]\n[3]x"])
+def test_invalid_separators(tmp_path, small_reads, text):
+    with pytest.raises(ValueError):
+        records(tmp_path, text)
+
+
+def test_ndjson_arrays(tmp_path, small_reads):
+    assert records(tmp_path, "[1]\n[2, 3]\n") == [[1], [2, 3]]
+    assert records(tmp_path, "[1, 2]\n") == [1, 2]
+    assert records(tmp_path, '[\n {"a": 1},\n {"a": 2}\n]\n') == \
+        [{'a': 1}, {'a': 2}]
+
+
+def test_invalid_line(tmp_path):
+    with pytest.raises(ValueError, match="line 2"):
+        records(tmp_path, '{"a": 1}\n{"a":\n')
+
+
+def test_progress_resume_state():
+    progress = load.Progress(offset=100, batch=10)
+    progress.complete(0, 10)
+    progress.complete(2, 10)
+    progress.complete(3, 10)
+    assert progress.rows == 10
+    assert progress.state() == {'offset': 110, 'batch': 10, 'done': [1, 2]}
+    progress.complete(1, 10)
+    assert progress.state() == {'offset': 140, 'batch': 10, 'done': []}
@@ -0,0 +1,39 @@
+import enum
+from datetime import datetime, date, time, timezone, timedelta
+from decimal import Decimal
+import pytest
+from bee.core.utils import BMsgPack
+
+
+@BMsgPack.register_enum
+class Color(enum.Enum):
+    red = 1
+
+
+class Size(enum.Enum):
+    big = 1
+
+
+@pytest.mark.parametrize("value", [
+    datetime(2020, 1, 2, 3, 4, 5, 6),
+    datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=3))),
+    date(2020, 1, 2),
+    time(3, 4, 5, 6),
+    Decimal("12.50"),
+    Color.red,
+])
+def test_ext_round_trip(value):
+    assert BMsgPack.decode(BMsgPack.encode({'v': value})) == {'v': value}
+
+
+def test_unregistered_enum_decodes_to_name():
+    assert BMsgPack.decode(BMsgPack.encode([Size.big])) == ["big"]
+
+
+def test_plain_values():
+    data = {'s': "ü", 'b': b"\x00\x01", 'n': [1, 2.5, None, True], 1: "int key"}
+    assert BMsgPack.decode(BMsgPack.encode(data)) == data
+
+
+def test_sets_use_the_json_converters():
+    assert BMsgPack.decode(BMsgPack.encode({'s': {1}})) == {'s': [1]}
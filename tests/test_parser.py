@@ -0,0 +1,19 @@
+import pytest
+from bee.core.utils import URLExpression, ConsoleToURLExpression
+
+
+def console(cmd):
+    return URLExpression(ConsoleToURLExpression(cmd).url).data
+
+
+def test_console_casts():
+    data = console('shop.Cart.add qty="i+ 2" ok="bool+ true" '
+                   'no="b+ False" ids="[,i+]1,2"')
+    assert (data['_m'], data['_c'], data['_f']) == ("shop", "Cart", "add")
+    assert data['data'] == {'qty': 2, 'ok': True, 'no': False,
+                            'ids': [1, 2]}
+
+
+def test_repeated_equals_rejected():
+    with pytest.raises(ValueError):
+        console("shop.Cart.add x=y=z")
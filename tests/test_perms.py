@@ -0,0 +1,39 @@
+from bee.core.perms import PermissionSet
+from bee.core.utils import Action
+
+
+def action(m, c, f, **data):
+    return Action({'_m': m, '_c': c, '_f': f, 'data': data})
+
+
+def test_exact_and_wildcard_rules():
+    perms = PermissionSet([{'m': "shop", 'c': "Cart", 'f': "add"},
+                           {'m': "blog", 'c': None, 'f': None}])
+    assert len(perms) == 2
+    assert perms.match(action("shop", "Cart", "add")) is True
+    assert perms.match(action("shop", "Cart", "remove")) is None
+    assert perms.match(action("blog", "Post", "list")) is True
+    assert perms.match(action("news", "Post", "list")) is None
+
+
+def test_param_rules():
+    perms = PermissionSet([{'m': "shop", 'c': "Cart", 'f': "add",
+                            'params': {'qty': r"^[1-9]$"}}])
+    assert perms.match(action("shop", "Cart", "add", qty=3)) is True
+    assert perms.match(action("shop", "Cart", "add", qty=12)) is None
+    assert perms.match(action("shop", "Cart", "add")) is None
+
+
+def test_param_free_rule_wins():
+    perms = PermissionSet([{'m': "shop", 'params': {'qty': "^1$"}},
+                           {'m': "shop", 'c': "Cart"}])
+    assert perms.lookup("shop", "Cart", "add") is True
+    assert perms.match(action("shop", "Cart", "add", qty=5)) is True
+
+
+def test_cache_is_bounded():
+    perms = PermissionSet([{'m': "shop"}], cache_size=2)
+    for f in ("a", "b", "c"):
+        perms.lookup("shop", "Cart", f)
+    assert len(perms.cache) <= 2
+    assert perms.match(action("shop", "Cart", "a")) is True
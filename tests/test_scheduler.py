@@ -0,0 +1,111 @@
+import asyncio
+from bee.core.scheduler import ActionScheduler
+from bee.core.stats import Stats
+
+
+class App:
+    def __init__(self, loop):
+        self.loop = loop
+        self.stats = Stats()
+        self.published = []
+
+    def publish(self, kind, **kw):
+        self.published.append((kind, kw))
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro(loop))
+    finally:
+        loop.close()
+
+
+async def idle(scheduler):
+    while scheduler.busy():
+        await asyncio.sleep(0.01)
+
+
+def test_priorities():
+    async def main(loop):
+        app = App(loop)
+        scheduler = ActionScheduler(app, workers=1)
+        order = []
+
+        def job(name):
+            async def f():
+                order.append(name)
+            return f
+        scheduler.submit("ws", job("ws"), priority="ws")
+        scheduler.submit("web", job("web"), priority="web")
+        scheduler.submit("console", job("console"), priority="console")
+        await idle(scheduler)
+        scheduler.stop()
+        return order
+    assert run(main) == ["console", "ws", "web"]
+
+
+def test_per_client_limit_and_shedding():
+    async def main(loop):
+        app = App(loop)
+        scheduler = ActionScheduler(app, workers=1, per_client=2,
+                                    queue_size=3)
+
+        async def f():
+            await asyncio.sleep(0.01)
+        results = [scheduler.submit("a", f, client="c1") for _ in range(3)]
+        results += [scheduler.submit("b", f, client=i) for i in range(3)]
+        await idle(scheduler)
+        scheduler.stop()
+        return results, scheduler.stats()
+    results, stats = run(main)
+    assert results == [True, True, False, True, False, False]
+    assert stats['shed'] == 3
+    assert stats['clients'] == 0
+
+
+def test_default_timeout():
+    async def main(loop):
+        app = App(loop)
+        scheduler = ActionScheduler(app, workers=2, timeout=0.05)
+
+        async def slow():
+            await asyncio.sleep(1)
+        scheduler.submit("slow", slow, client="c1")
+        scheduler.submit("unlimited", lambda: asyncio.sleep(0.1), timeout=0)
+        await idle(scheduler)
+        scheduler.stop()
+        return app.published, scheduler.stats()
+    published, stats = run(main)
+    assert stats['timeouts'] == 1
+    assert published[0][0] == "error"
+    assert published[0][1]['detail'] == "slow"
+
+
+def test_cancel_client_jobs():
+    async def main(loop):
+        app = App(loop)
+        scheduler = ActionScheduler(app, workers=1)
+        done = []
+
+        async def f():
+            await asyncio.sleep(0.05)
+            done.append(True)
+        scheduler.submit("a", f, client="c1")
+        scheduler.submit("b", f, client="c1")
+        await asyncio.sleep(0.01)
+        scheduler.cancel("c1")
+        await idle(scheduler)
+        scheduler.stop()
+        return done, app.published
+    done, published = run(main)
+    assert done == []
+    assert published == []
+
+
+def test_closing_sheds_new_jobs():
+    async def main(loop):
+        scheduler = ActionScheduler(App(loop), workers=1)
+        scheduler.closing = True
+        return scheduler.submit("a", lambda: asyncio.sleep(0))
+    assert run(main) is False
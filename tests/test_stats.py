@@ -0,0 +1,51 @@
+from bee.core.stats import Histogram, Stats
+
+
+def test_empty_histogram():
+    h = Histogram()
+    assert h.percentile(50) == 0
+    assert h.summary()['count'] == 0
+
+
+def test_small_values_are_exact():
+    h = Histogram()
+    for us in range(1, 51):
+        h.record(us / 1000000.0)
+    assert h.count == 50
+    assert h.max == 50
+    assert h.percentile(50) == 25
+    assert h.percentile(100) == 50
+
+
+def test_large_values_within_precision():
+    h = Histogram()
+    for ms in range(1, 1001):
+        h.record(ms / 1000.0)
+    s = h.summary()
+    assert s['max'] == 1000000
+    assert s['avg'] == 500500
+    for p, expected in ((50, 500000), (90, 900000), (99, 990000)):
+        assert abs(h.percentile(p) - expected) <= expected * 0.04
+
+
+def test_percentile_never_above_max():
+    h = Histogram()
+    h.record(0.123456)
+    assert h.percentile(99) == h.max == 123456
+
+
+def test_stats_record():
+    stats = Stats()
+    stats.record("a.B.f", "action", 0.001)
+    stats.record_all("a.B.f", {'parse': 0.0001, 'action': 0.003})
+    report = stats.report()
+    assert report["a.B.f"]["action"]['count'] == 2
+    assert [r[1] for r in stats.rows()[1:]] == ["parse", "action"]
+    stats.reset()
+    assert stats.report() == {}
+
+
+def test_disabled_stats():
+    stats = Stats(enabled=False)
+    stats.record("a.B.f", "action", 0.001)
+    assert stats.report() == {}
@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from bee.core.tasks import TaskGroup, Fanout
+
+
+def run(main):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(main(loop))
+    finally:
+        loop.close()
+
+
+def test_restart_on_failure_with_backoff():
+    async def main(loop):
+        group = TaskGroup(loop)
+        starts = []
+
+        async def flaky():
+            starts.append(loop.time())
+            if len(starts) < 4:
+                raise ValueError("boom")
+            return "ok"
+        task = group.spawn("flaky", flaky, restart="on-failure",
+                           backoff=0.01, max_backoff=0.03)
+        return await task, starts, group.get("flaky").stats()
+    result, starts, stats = run(main)
+    assert result == "ok"
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # 0.01 * 2^(n-1), capped at max_backoff
+    for gap, expected in zip(gaps, (0.01, 0.02, 0.03)):
+        assert expected - 0.002 <= gap < expected + 0.02
+    assert stats['failures'] == 3
+    assert stats['starts'] == 4
+    assert stats['last_error'] == "ValueError('boom')"
+
+
+def test_never_restart_raises():
+    async def main(loop):
+        group = TaskGroup(loop)
+
+        async def fail():
+            raise KeyError("x")
+        task = group.spawn("once", fail())
+        with pytest.raises(KeyError):
+            await task
+        return group.stats()
+    stats = run(main)
+    assert stats['failed'] == 1
+    assert stats['tasks']['once']['starts'] == 1
+
+
+def test_always_restarts_after_clean_exit():
+    async def main(loop):
+        group = TaskGroup(loop)
+        runs = []
+
+        async def job():
+            runs.append(1)
+        group.spawn("poll", job, restart="always", backoff=0.01)
+        await asyncio.sleep(0.055)
+        await group.stop()
+        return runs, group.stats()
+    runs, stats = run(main)
+    assert 4 <= len(runs) <= 6
+    assert stats['running'] == 0
+
+
+def test_spawn_checks():
+    async def main(loop):
+        group = TaskGroup(loop)
+        coro = asyncio.sleep(0)
+        with pytest.raises(ValueError):
+            group.spawn("x", coro, restart="always")
+        coro.close()
+        with pytest.raises(ValueError):
+            group.spawn("x", lambda: asyncio.sleep(0), restart="sometimes")
+        group.spawn("x", lambda: asyncio.sleep(1))
+        with pytest.raises(ValueError):
+            group.spawn("x", lambda: asyncio.sleep(1))
+        unnamed = group.spawn(None, asyncio.sleep(0))
+        await unnamed
+        await asyncio.sleep(0)
+        names = list(group.registry)
+        await group.stop()
+        return names
+    # finished unnamed tasks leave the registry
+    assert run(main) == ["x"]
+
+
+def test_fanout_limit():
+    async def main(loop):
+        fanout = Fanout(2)
+        peak = []
+
+        async def item():
+            peak.append(fanout.active)
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*[fanout.run(item()) for _ in range(6)])
+        return max(peak), fanout.done
+    assert run(main) == (2, 6)
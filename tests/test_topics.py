@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+
+def frames(client):
+    return [json.loads(msg.decode()) for msg, _ in client.frames]
+
+
+def test_join_leave(app, connect):
+    a, b = connect(), connect()
+    app.join(a, "news")
+    app.join(a, "sport")
+    app.join(b, "news")
+    assert app.topics == {'news': {a, b}, 'sport': {a}}
+    app.leave(a, "news")
+    assert app.topics == {'news': {b}, 'sport': {a}}
+    app.leave(a)
+    assert app.topics == {'news': {b}}
+    assert a not in app.memberships
+
+
+def test_disconnect_leaves_topics(app, connect):
+    a = connect()
+    app.join(a, "news")
+    app.remove_client(a)
+    assert app.topics == {}
+    assert app.memberships == {}
+
+
+def test_topic_broadcast(app, connect):
+    a, b, c = connect(), connect(), connect()
+    app.join(a, "news")
+    app.join(b, "news")
+    app.bsend(_topic="news", title="x")
+    assert frames(a) == frames(b) == [{'title': "x"}]
+    assert c.frames == []
+    app.bsend(_topic="empty", title="y")
+    assert c.frames == []
+
+
+def test_encoded_once_per_codec(app, connect):
+    a, b, c = connect(), connect(), connect()
+    app.set_codec(c, "msgpack")
+    app.deliver([a, b, c], {'n': 1})
+    assert a.frames[0][0] is b.frames[0][0]
+    assert c.frames[0][1] is True
+
+
+def test_chunked_fanout(app, connect, loop):
+    # bchunk is 2, 5 receivers are sent in chunks from a task
+    clients = [connect() for _ in range(5)]
+    app.bsend(n=1)
+    assert all(c.frames == [] for c in clients)
+    loop.run_until_complete(asyncio.sleep(0.01))
+    assert all(frames(c) == [{'n': 1}] for c in clients)
+    assert len({id(c.frames[0][0]) for c in clients}) == 1
+
@@ -0,0 +1,52 @@
+import json
+
+
+class Account:
+    def event_dict(self, event):
+        return {'event': event}
+
+
+def login(app, client, uid):
+    app.users[client].login(uid, "127.0.0.1", "ws", Account())
+
+
+def frames(client):
+    return [json.loads(msg.decode()) for msg, _ in client.frames]
+
+
+def test_send_to_uid(app, connect):
+    a, b, other = connect(), connect(), connect()
+    login(app, a, 7)
+    login(app, b, 7)
+    login(app, other, 8)
+    assert app.get_clients(7) == {a, b}
+    assert app.is_online(7) == 2
+    app.send(_uid=7, msg="hi")
+    assert frames(a) == frames(b) == [{'msg': "hi"}]
+    assert other.frames == []
+
+
+def test_relogin_moves_the_client(app, connect):
+    a = connect()
+    login(app, a, 7)
+    login(app, a, 8)
+    assert 7 not in app.uids
+    assert app.get_clients(8) == {a}
+
+
+def test_logout_and_disconnect_unbind(app, connect):
+    a, b = connect(), connect()
+    login(app, a, 7)
+    login(app, b, 7)
+    app.users[a].logout()
+    assert app.get_clients(7) == {b}
+    app.remove_client(b)
+    assert app.uids == {}
+    assert app.is_online(7) == 0
+    assert [e for e, _ in app.published] == ["orm", "orm"]
+
+
+def test_send_to_offline_uid(app, connect):
+    a = connect()
+    app.send(_uid=9, msg="hi")
+    assert a.frames == []